@@ -0,0 +1,97 @@
+from settings import *  # Import all configuration settings
+from instrument import get_logger  # Leveled, rate-limited logging
+import pygame as pg  # Import Pygame for decoding and scaling images
+import hashlib  # Hash of the bundle sources
+import json  # Bundle index format
+import os  # For source file stats and atomic writes
+import pathlib  # For file and directory path manipulations
+import struct  # Fixed-size bundle header
+
+log = get_logger('assets')
+
+BUNDLE_MAGIC = b'TAB1'  # File signature and format version
+HEADER = struct.Struct('<4sI')  # Magic and length of the JSON index that follows
+
+
+def tile_files(directory=SPRITE_DIR_PATH):
+    """Tile image files, in the order their colour indices refer to."""
+    return sorted(item for item in pathlib.Path(directory).rglob('*.png') if item.is_file())  # Same order on every filesystem
+
+
+def bundle_key(files, tile_size, size):
+    """Hash of everything the bundle depends on: source paths, sizes and modification times, tile and window size."""
+    digest = hashlib.sha256(repr((tile_size, size)).encode())
+    for file in files:
+        stat = os.stat(file)
+        digest.update(f'{file}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def build_images(tiles, background, tile_size, size):
+    """Decode and scale the source images: every tile to tile_size and the background to the window size."""
+    images = [(f'tile{i}', pg.transform.scale(pg.image.load(file).convert_alpha(), (tile_size, tile_size)))
+              for i, file in enumerate(tiles)]
+    images.append(('background', pg.transform.scale(pg.image.load(background).convert(), size)))
+    return images
+
+
+def write_bundle(path, key, images):
+    """Write the images as raw pixels behind a JSON index, atomically."""
+    index, blobs, offset = [], [], 0  # Index entry (name, width, height, pixel format, offset, length) per image
+    for name, surface in images:
+        fmt = 'RGBA' if surface.get_flags() & pg.SRCALPHA else 'RGB'
+        blob = pg.image.tobytes(surface, fmt)
+        index.append((name, surface.get_width(), surface.get_height(), fmt, offset, len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+    meta = json.dumps({'key': key, 'images': index}).encode()
+
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER.pack(BUNDLE_MAGIC, len(meta)) + meta + b''.join(blobs))
+    os.replace(path + '.tmp', path)
+
+
+def read_bundle(path, key):
+    """Read the bundle in one go and return its images by name, or None when it is missing, stale or damaged."""
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return None
+    try:
+        magic, length = HEADER.unpack_from(data)
+        if magic != BUNDLE_MAGIC:
+            return None
+        meta = json.loads(data[HEADER.size:HEADER.size + length])
+        if meta['key'] != key:
+            return None  # Built from other sources, tile size or window size
+
+        pixels = memoryview(data)[HEADER.size + length:]
+        images = {}
+        for name, width, height, fmt, offset, size in meta['images']:
+            if offset + size > len(pixels):
+                raise ValueError(f'image {name} is cut off')
+            surface = pg.image.frombuffer(pixels[offset:offset + size], (width, height), fmt)
+            images[name] = surface.convert_alpha() if fmt == 'RGBA' else surface.convert()  # Copies out of the buffer
+    except (struct.error, ValueError, KeyError, TypeError, pg.error) as error:
+        log.warning('Asset bundle %s is damaged, rebuilding it: %s', path, error)
+        return None  # A cache never stops the game from starting
+    return images
+
+
+def load_assets(size, tile_size=TILE_SIZE, tile_dir=SPRITE_DIR_PATH, background=BG_PATH, cache_dir=ASSET_CACHE_DIR):
+    """Return (tiles, background) scaled for a window of the given size, from the bundle when it is up to date."""
+    path = f'{cache_dir}/assets-{tile_size}.bundle'  # One bundle per tile size, so switching sizes rebuilds nothing
+    tiles = tile_files(tile_dir)
+    key = bundle_key(tiles + [pathlib.Path(background)], tile_size, size)
+    images = read_bundle(path, key)
+    if images is None:
+        built = build_images(tiles, background, tile_size, size)
+        try:
+            write_bundle(path, key, built)
+            log.info('Asset bundle written to %s', path)
+        except OSError as error:
+            log.warning('Asset bundle not written: %s', error)  # Still playable, only slower to start
+        images = dict(built)
+    return [images[f'tile{i}'] for i in range(len(tiles))], images['background']
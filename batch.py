@@ -0,0 +1,260 @@
+from settings import *  # Import all configuration settings
+from tetromino import ROTATIONS, KICKS, SPAWN_POSITIONS  # Import the precomputed rotation and kick tables
+from pieces import SHAPES, PIECE_SOURCES  # Import the shape order used by the piece sources
+import numpy as np  # NumPy arrays hold the state of every board
+import argparse  # For command-line options
+import sys  # For the exit status
+
+U64 = np.uint64  # PRNG arithmetic is done on wrapping unsigned 64-bit integers
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}  # Action name -> code used by BatchTetris.step
+
+# Rotation and kick tables as arrays indexed by [shape, orientation]
+CELL_X = np.array([[[dx for dx, dy in ROTATIONS[shape][o][0]] for o in range(4)] for shape in SHAPES])
+CELL_Y = np.array([[[dy for dx, dy in ROTATIONS[shape][o][0]] for o in range(4)] for shape in SHAPES])
+KICK_OFFSETS = np.array([[KICKS[shape][o] for o in range(4)] for shape in SHAPES])  # [shape, orientation, kick, (x, y)]
+SPAWN_XY = np.array([SPAWN_POSITIONS[shape] for shape in SHAPES])  # Pivot spawn position of every shape
+
+
+class BatchTetris:
+    """N Tetris games stepped together with NumPy, following the same rules and piece sequence as Tetris.step."""
+    def __init__(self, seeds, piece_source=PIECE_SOURCE):
+        if FIELD_W > 63:
+            raise ValueError(f'rows are int64 bitmasks, so a {FIELD_W}-column field does not fit (at most 63)')
+        seeds = np.asarray(seeds, dtype=np.int64)
+        n = len(seeds)
+        self.size = n  # Number of boards
+        width, height = self.width, self.height = FIELD_W, FIELD_H  # Field size of every board, the same as Tetris
+        self.full_mask = (1 << width) - 1  # Bitmask of a completely filled row
+        self.bag_source = piece_source == 'bag'  # Deal pieces from shuffled bags like BagPieces
+        if piece_source not in PIECE_SOURCES:
+            raise ValueError(f'unknown piece source {piece_source!r}')
+
+        self.rows = np.zeros((n, height), dtype=np.int64)  # Row bitmasks of every board, like Field.rows
+        self.colors = np.zeros((n, height, width), dtype=np.uint8)  # Tile colours of every board
+        self.random = self.seed_random(seeds)  # xorshift64* state of every board
+        self.bag = np.zeros((n, len(SHAPES)), dtype=np.int64)  # Shapes left in the current bag
+        self.bag_size = np.zeros(n, dtype=np.int64)  # Number of shapes left in the bag
+
+        self.shape = np.zeros(n, dtype=np.int64)  # Current Tetromino shape index
+        self.color = np.zeros(n, dtype=np.int64)  # Current Tetromino tile colour
+        self.orientation = np.zeros(n, dtype=np.int64)  # Current Tetromino orientation
+        self.x = np.zeros(n, dtype=np.int64)  # Current Tetromino pivot column
+        self.y = np.zeros(n, dtype=np.int64)  # Current Tetromino pivot row
+        self.next_shape = np.zeros(n, dtype=np.int64)  # Next Tetromino shape index
+        self.next_color = np.zeros(n, dtype=np.int64)  # Next Tetromino tile colour
+
+        self.landing = np.zeros(n, dtype=bool)  # Landed flags, set by a blocked fall or a hard drop
+        self.speed_up = np.zeros(n, dtype=bool)  # Fast falling flags
+        self.paused = np.zeros(n, dtype=bool)  # Pause flags
+        self.game_over = np.zeros(n, dtype=bool)  # Game over flags
+        self.score = np.zeros(n, dtype=np.int64)  # Score of every board
+        self.lines = np.zeros(n, dtype=np.int64)  # Total lines cleared on every board
+        self.points_per_lines = np.array([0, 100, 300, 700, 1500], dtype=np.int64)  # Points by lines cleared at once
+        self.ticks = 0  # Number of logical ticks simulated so far
+
+        everyone = np.arange(n)
+        self.shape[:], self.color[:] = self.next_piece(everyone)  # Current Tetromino
+        self.spawn(everyone)
+        self.next_shape[:], self.next_color[:] = self.next_piece(everyone)  # Next Tetromino preview
+
+    def seed_random(self, seeds):
+        """Vectorised splitmix64, matching pieces.XorShift seeding."""
+        value = seeds.astype(U64) + U64(0x9E3779B97F4A7C15)
+        value = (value ^ (value >> U64(30))) * U64(0xBF58476D1CE4E5B9)
+        value = (value ^ (value >> U64(27))) * U64(0x94D049BB133111EB)
+        value ^= value >> U64(31)
+        value[value == 0] = 1  # xorshift must never hold a zero state
+        return value
+
+    def randrange(self, idx, n):
+        """Vectorised XorShift.randrange for the given boards."""
+        x = self.random[idx]
+        x ^= x >> U64(12)
+        x ^= x << U64(25)
+        x ^= x >> U64(27)
+        self.random[idx] = x
+        return ((x * U64(0x2545F4914F6CDD1D)) >> U64(32)) % U64(n)
+
+    def next_piece(self, idx):
+        """Draw the next (shape, colour) for the given boards, like RandomPieces/BagPieces.next_piece."""
+        if not self.bag_source:
+            shape = self.randrange(idx, len(SHAPES)).astype(np.int64)
+        else:
+            empty = idx[self.bag_size[idx] == 0]
+            if empty.size:
+                self.bag[empty] = np.arange(len(SHAPES))
+                for i in range(len(SHAPES) - 1, 0, -1):  # Fisher-Yates shuffle
+                    j = self.randrange(empty, i + 1).astype(np.int64)
+                    picked = self.bag[empty, j]
+                    self.bag[empty, j] = self.bag[empty, i]
+                    self.bag[empty, i] = picked
+                self.bag_size[empty] = len(SHAPES)
+            self.bag_size[idx] -= 1
+            shape = self.bag[idx, self.bag_size[idx]]  # Deal from the end of the bag
+        return shape, self.randrange(idx, TILE_COUNT).astype(np.int64)
+
+    def spawn(self, idx):
+        """Put the current Tetromino of the given boards at its spawn point."""
+        self.orientation[idx] = 0
+        self.x[idx] = SPAWN_XY[self.shape[idx], 0]
+        self.y[idx] = SPAWN_XY[self.shape[idx], 1]
+
+    def cells(self, idx, x, y, orientation):
+        """Field cells of the current Tetromino of the given boards, as (n, 4) column and row arrays."""
+        shape = self.shape[idx]
+        return x[:, None] + CELL_X[shape, orientation], y[:, None] + CELL_Y[shape, orientation]
+
+    def is_collide(self, idx, x, y, orientation):
+        """Check the current Tetromino of the given boards against walls, floor and landed blocks."""
+        cx, cy = self.cells(idx, x, y, orientation)
+        outside = (cx < 0) | (cx >= self.width) | (cy >= self.height)
+        rows = self.rows[idx[:, None], np.clip(cy, 0, self.height - 1)]
+        occupied = (rows >> np.clip(cx, 0, self.width - 1)) & 1 == 1
+        return (outside | (occupied & (cy >= 0))).any(axis=1)
+
+    def move(self, idx, dx, dy):
+        """Move the given boards' Tetromino if possible, returning the boards where it was blocked."""
+        x, y = self.x[idx] + dx, self.y[idx] + dy
+        blocked = self.is_collide(idx, x, y, self.orientation[idx])
+        free = idx[~blocked]
+        self.x[free] += dx
+        self.y[free] += dy
+        self.landing[free] = False
+        return idx[blocked]
+
+    def hard_drop(self, idx):
+        """Move the given boards' Tetromino straight down until it lands, like Tetromino.hard_drop."""
+        while idx.size:
+            blocked = self.is_collide(idx, self.x[idx], self.y[idx] + 1, self.orientation[idx])
+            idx = idx[~blocked]
+            self.y[idx] += 1
+
+    def rotate(self, idx):
+        """Rotate the given boards' Tetromino, trying the wall kicks in order like Tetromino.rotate."""
+        kicks = KICK_OFFSETS[self.shape[idx], self.orientation[idx]]  # (n, kicks, 2)
+        orientation = (self.orientation[idx] + 1) % 4
+        pending = np.ones(idx.size, dtype=bool)  # Boards still looking for a free kick
+        for k in range(kicks.shape[1]):
+            x, y = self.x[idx] + kicks[:, k, 0], self.y[idx] + kicks[:, k, 1]
+            fits = pending & ~self.is_collide(idx, x, y, orientation)
+            hit = idx[fits]
+            self.x[hit], self.y[hit], self.orientation[hit] = x[fits], y[fits], orientation[fits]
+            pending &= ~fits
+
+    def control(self, actions):
+        """Apply one action code per board (-1 for none), like Tetris.control."""
+        frozen = (self.paused | self.game_over) & (actions != ACTION_CODES['pause'])
+        actions = np.where(frozen, -1, actions)  # Only 'pause' acts on a paused or finished board
+        self.move(np.flatnonzero(actions == ACTION_CODES['left']), -1, 0)
+        self.move(np.flatnonzero(actions == ACTION_CODES['right']), 1, 0)
+        self.rotate(np.flatnonzero(actions == ACTION_CODES['rotate']))
+        self.speed_up[actions == ACTION_CODES['down']] = True
+        pause = actions == ACTION_CODES['pause']
+        self.paused[pause] = ~self.paused[pause]
+        drop = np.flatnonzero(actions == ACTION_CODES['drop'])
+        self.hard_drop(drop)
+        self.landing[drop] = True
+        self.speed_up[drop] = False
+
+    def lock(self, idx):
+        """Land the Tetromino of the given boards, spawn the next one and clear lines, like check_tetromino_landing."""
+        cx, cy = self.cells(idx, self.x[idx], self.y[idx], self.orientation[idx])
+        visible = cy >= 0  # Only update if inside the visible field
+        board = np.broadcast_to(idx[:, None], cx.shape)[visible]
+        np.bitwise_or.at(self.rows, (board, cy[visible]), np.left_shift(1, cx[visible]))
+        self.colors[board, cy[visible], cx[visible]] = np.broadcast_to(self.color[idx, None], cx.shape)[visible]
+
+        self.shape[idx], self.color[idx] = self.next_shape[idx], self.next_color[idx]  # Switch to next Tetromino
+        self.spawn(idx)
+        self.next_shape[idx], self.next_color[idx] = self.next_piece(idx)  # Generate a new next Tetromino
+
+        # Check if new Tetromino collides immediately (game over condition)
+        cx, cy = self.cells(idx, self.x[idx], self.y[idx], self.orientation[idx])
+        over = (cy < 0).any(axis=1) | self.is_collide(idx, self.x[idx], self.y[idx], self.orientation[idx])
+        self.game_over[idx[over]] = True
+        self.clear_full_lines(idx[~over])
+
+    def clear_full_lines(self, idx):
+        """Remove full rows of the given boards, shift the rows above down and add the score."""
+        full = self.rows[idx] == self.full_mask
+        lines = full.sum(axis=1)
+        idx, full, lines = idx[lines > 0], full[lines > 0], lines[lines > 0]
+        if idx.size:
+            order = np.argsort(~full, axis=1, kind='stable')  # Full rows first, kept rows in their order
+            rows = np.take_along_axis(self.rows[idx], order, axis=1)
+            colors = np.take_along_axis(self.colors[idx], order[:, :, None], axis=1)
+            empty = np.arange(self.height) < lines[:, None]  # Empty rows enter at the top
+            rows[empty] = 0
+            colors[empty] = 0
+            self.rows[idx], self.colors[idx] = rows, colors
+            self.lines[idx] += lines
+            self.score[idx] += self.points_per_lines[lines]
+
+    def step(self, actions=None):
+        """Advance every board by one logical tick, applying one action code per board first (-1 for none)."""
+        self.ticks += 1
+        anim_trigger = self.ticks % ANIM_TICKS == 0  # Normal falling tick
+        fast_anim_trigger = self.ticks % FAST_ANIM_TICKS == 0  # Fast falling tick
+        if actions is not None:
+            self.control(np.asarray(actions))
+
+        active = ~(self.paused | self.game_over)
+        idx = np.flatnonzero(np.where(self.speed_up, fast_anim_trigger, anim_trigger) & active)
+        if idx.size:
+            landed = self.move(idx, 0, 1)  # Move the Tetromino down
+            self.landing[landed] = True
+            self.speed_up[landed] = False  # Reset fast falling mode
+        landed = np.flatnonzero(self.landing & active)  # Landed by falling or by a hard drop
+        if landed.size:
+            self.landing[landed] = False  # The next Tetromino starts in the air
+            self.lock(landed)
+
+
+def mismatches(batch, games):
+    """Indices of the boards whose state differs from the matching Tetris game."""
+    bad = []
+    for i, tetris in enumerate(games):
+        same = (tetris.score == batch.score[i] and tetris.game_over == batch.game_over[i]
+                and tetris.field.rows == batch.rows[i].tolist() and bytes(tetris.field.colors) == batch.colors[i].tobytes()
+                and tetris.next_tetromino.shape == SHAPES[batch.next_shape[i]])
+        if same and not tetris.game_over:  # A finished game's piece may overlap the stack, so only live pieces count
+            tetromino = tetris.tetromino
+            same = (tetromino.x, tetromino.y, tetromino.orientation) == (batch.x[i], batch.y[i], batch.orientation[i])
+        if not same:
+            bad.append(i)
+    return bad
+
+
+def check_parity(boards, ticks, piece_source, seed=0):
+    """Step BatchTetris and one Tetris per board with the same random inputs, returning the boards that diverged."""
+    from tetris import Tetris  # Only needed for the check
+    seeds = np.arange(boards) + seed
+    batch, games = BatchTetris(seeds, piece_source), [Tetris(int(s), piece_source) for s in seeds]
+    rng = np.random.default_rng(seed)
+    codes = [-1, *range(len(ACTIONS))]  # No action, then every action code
+    odds = {'down': 0.05, 'pause': 0.001, 'drop': 0.05}  # Other actions: 0.1 each
+    weights = np.array([0.6] + [odds.get(action, 0.1) for action in ACTIONS])
+    bad = set()
+    for tick in range(ticks):
+        actions = rng.choice(codes, size=boards, p=weights / weights.sum())
+        batch.step(actions)
+        for tetris, code in zip(games, actions):
+            tetris.step([ACTIONS[code]] if code >= 0 else [])
+        if tick % 100 == 0 or tick == ticks - 1:
+            bad.update(mismatches(batch, games))
+    return sorted(bad)
+
+
+# Check that BatchTetris follows the same rules as Tetris.step
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare BatchTetris against Tetris.step on seeded random inputs.')
+    parser.add_argument('--boards', type=int, default=200, help='boards per piece source')
+    parser.add_argument('--ticks', type=int, default=3000, help='ticks to simulate')
+    parser.add_argument('--seed', type=int, default=0, help='first board seed, also seeds the inputs')
+    args = parser.parse_args()
+    failed = False
+    for source in PIECE_SOURCES:
+        bad = check_parity(args.boards, args.ticks, source, args.seed)
+        print(f'{source}: {len(bad)} of {args.boards} boards differ' + (f' (first {bad[0]})' if bad else ''))
+        failed |= bool(bad)
+    sys.exit(1 if failed else 0)
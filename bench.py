@@ -0,0 +1,245 @@
+import os  # For the headless SDL drivers
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')  # Run without a window, before pygame is imported
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  # Keep stdout clean for the JSON results
+
+from settings import *  # Import all configuration settings
+from tetris import Tetris  # Import headless Tetris game logic
+from tetromino import Tetromino  # Import Tetromino class
+from field import Field  # Import the bitboard field engine
+from snapshot import snapshot, restore  # Fixed-layout game state
+import argparse  # For command-line options
+import functools  # The App is created once for all rendering benchmarks
+import gc  # Garbage collection is paused while timing, like timeit
+import json  # Machine-readable results and baselines
+import platform  # Machine description stored with the results
+import random  # Seeded board contents
+import statistics  # Median of the repeats
+import sys  # For the exit status and progress output
+import time  # High resolution timer
+
+
+def garbage_field(rng, rows, full=0):
+    """A field with the given number of garbage rows at the bottom (one hole each), the lowest full ones complete."""
+    field = Field()
+    for y in range(FIELD_H - rows, FIELD_H):
+        hole = -1 if y >= FIELD_H - full else rng.randrange(FIELD_W)  # Full rows have no hole
+        field.place([(x, y) for x in range(FIELD_W) if x != hole], rng.randrange(TILE_COUNT))
+    return field
+
+
+def bench_line_clears(number):
+    """Tetris.check_full_lines on crafted boards clearing 0 to 4 lines under garbage."""
+    rng = random.Random(0)
+    boards = [garbage_field(rng, 10, full) for full in range(5)]
+    tetris = Tetris(seed=0)
+    fields = [boards[i % len(boards)].copy() for i in range(number)]
+    start = time.perf_counter()
+    for field in fields:
+        tetris.field = field
+        tetris.check_full_lines()
+    return time.perf_counter() - start
+
+
+def bench_move_rotate(number):
+    """Tetromino.move left/right and Tetromino.rotate on a half-filled board, hitting walls and blocks."""
+    tetris = Tetris(seed=0)
+    tetris.field = garbage_field(random.Random(0), FIELD_H // 2)
+    tetromino = tetris.tetromino
+    move, rotate = tetromino.move, tetromino.rotate
+    start = time.perf_counter()
+    for _ in range(number // 4):
+        move('left')
+        rotate()
+        move('right')
+        move('right')
+    return time.perf_counter() - start
+
+
+def bench_spawn(number):
+    """Tetromino construction, as done for every new piece."""
+    tetris = Tetris(seed=0)
+    start = time.perf_counter()
+    for _ in range(number):
+        Tetromino(tetris, current=False)
+    return time.perf_counter() - start
+
+
+def bench_step(number):
+    """Tetris.step ticks of seeded games with random inputs, restarting a game when it is over."""
+    rng = random.Random(0)
+    inputs = [[rng.choice(ACTIONS[:4])] if rng.random() < 0.2 else [] for _ in range(number)]
+    tetris = Tetris(seed=0)
+    start = time.perf_counter()
+    for actions in inputs:
+        tetris.step(actions)
+        if tetris.game_over:
+            tetris = Tetris(seed=tetris.ticks)
+    return time.perf_counter() - start
+
+
+def played_game():
+    """A seeded game with a few landed Tetrominoes."""
+    tetris = Tetris(seed=0, piece_source='bag')
+    for tick in range(400):
+        tetris.step(['drop'] if tick % 40 == 0 else [])
+    return tetris
+
+
+def bench_snapshot(number):
+    """Packing the whole game state, as done once per Tetromino for undo in practice mode, on F5 and by rollback."""
+    tetris = played_game()
+    start = time.perf_counter()
+    for _ in range(number):
+        snapshot(tetris)
+    return time.perf_counter() - start
+
+
+def bench_restore(number):
+    """Restoring a game from a snapshot, as done on every rollback."""
+    tetris = played_game()
+    data = snapshot(tetris)
+    start = time.perf_counter()
+    for _ in range(number):
+        restore(tetris, data)
+    return time.perf_counter() - start
+
+
+@functools.cache
+def get_app():
+    """Create the App once for all rendering benchmarks."""
+    from main import App  # Imports pygame, only needed by the rendering benchmarks
+    return App()
+
+
+def mid_game(app):
+    """Put the App in the same mid-game position on every run."""
+    app.tetris = Tetris(seed=0)
+    app.renderer.reset()  # Also reseeds the effect randomness
+    rng = random.Random(0)
+    while app.tetris.ticks < 600 and not app.tetris.game_over:
+        app.tetris.step([rng.choice(ACTIONS[:3])] if rng.random() < 0.2 else [])
+        app.renderer.update()
+
+
+def bench_load_images(number):
+    """App.load_images: the tile images and background from the asset bundle, as done at startup."""
+    app = get_app()
+    start = time.perf_counter()
+    for _ in range(number):
+        app.load_images()
+    return time.perf_counter() - start
+
+
+def bench_restart(number):
+    """App.restart: the soft reset after Game Over, keeping the window and assets."""
+    app = get_app()
+    start = time.perf_counter()
+    for _ in range(number):
+        app.restart()
+    return time.perf_counter() - start
+
+
+def bench_draw(number):
+    """App.draw frames redrawing only the changed screen areas."""
+    app = get_app()
+    mid_game(app)
+    app.draw()
+    start = time.perf_counter()
+    for _ in range(number):
+        app.draw()
+    return time.perf_counter() - start
+
+
+def bench_draw_full(number):
+    """App.draw frames redrawing and flipping the whole screen."""
+    app = get_app()
+    mid_game(app)
+    renderer = app.renderer
+    start = time.perf_counter()
+    for _ in range(number):
+        renderer.full_redraw = True
+        app.draw()
+    return time.perf_counter() - start
+
+
+BENCHMARKS = {  # Name -> (function timing the given number of operations, operations per run)
+    'line_clears': (bench_line_clears, 20000),
+    'move_rotate': (bench_move_rotate, 200000),
+    'spawn': (bench_spawn, 100000),
+    'step': (bench_step, 100000),
+    'snapshot': (bench_snapshot, 100000),
+    'restore': (bench_restore, 100000),
+    'load_images': (bench_load_images, 5),
+    'restart': (bench_restart, 100),
+    'draw': (bench_draw, 300),
+    'draw_full': (bench_draw_full, 300)
+}
+
+
+def run(name, repeat, scale):
+    """Time a benchmark repeat times with garbage collection paused, returning its result in microseconds per op."""
+    function, number = BENCHMARKS[name]
+    number = max(1, int(number * scale))
+    function(max(1, number // 10))  # Warm up caches and lazily built state
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            times.append(function(number) / number * 1e6)
+        finally:
+            gc.enable()
+    return {'unit': 'us/op', 'number': number, 'repeat': repeat,
+            'best': min(times), 'median': statistics.median(times), 'times': times}
+
+
+def compare(results, baseline, tolerance):
+    """Return (name, current, baseline, ratio) of every benchmark slower than the baseline by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['best'] / baseline[name]['best']
+            result['baseline_ratio'] = ratio
+            if ratio > 1 + tolerance:
+                regressions.append((name, result['best'], baseline[name]['best'], ratio))
+    return regressions
+
+
+# Run the benchmarks and print the results as JSON
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the game logic and rendering headless. '
+                                                 'Results are printed to stdout as JSON; save them to use as a baseline.')
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=7, help='timed runs per benchmark; the best one is compared')
+    parser.add_argument('--scale', type=float, default=1, help='multiply the operations per run')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against the baseline before failing (0.2 = 20%%)')
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark {unknown[0]!r}, choose from {', '.join(BENCHMARKS)}")
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        results[name] = run(name, args.repeat, args.scale)
+        print(f"{name:12} best {results[name]['best']:10.3f} us/op  median {results[name]['median']:10.3f} us/op",
+              file=sys.stderr, flush=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.tolerance)
+        for name, current, base, ratio in regressions:
+            print(f'REGRESSION {name}: {current:.3f} us/op vs baseline {base:.3f} us/op ({ratio:.2f}x)', file=sys.stderr)
+
+    json.dump({
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.processor() or platform.machine()},
+        'results': results,
+        'regressions': [name for name, *_ in regressions]
+    }, sys.stdout, indent=1)
+    print()
+    sys.exit(1 if regressions else 0)
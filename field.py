@@ -0,0 +1,131 @@
+from settings import *  # Import all configuration settings
+
+
+class Field:
+    """Bitboard playing field: one integer bitmask per row, tile colours kept in a flat bytearray."""
+    def __init__(self, width=FIELD_W, height=FIELD_H):
+        self.width = width  # Number of columns
+        self.height = height  # Number of rows
+        self.full_mask = (1 << width) - 1  # Bitmask of a completely filled row
+        self.rows = [0] * height  # Bit x of rows[y] is set when cell (x, y) is occupied
+        self.colors = bytearray(width * height)  # Tile colour index of every cell, row-major
+        self.version = 0  # Bumped on every change, lets renderers cache what they drew
+
+        # Surface index, kept up to date by place() and clear_full_lines()
+        self.columns = [0] * width  # Bit y of columns[x] is set when cell (x, y) is occupied
+        self.heights = [0] * width  # Height of the highest block of every column
+        self.filled = 0  # Number of occupied cells
+
+    def clear(self):
+        """Empty the whole field."""
+        self.rows = [0] * self.height
+        self.colors = bytearray(self.width * self.height)
+        self.columns = [0] * self.width
+        self.heights = [0] * self.width
+        self.filled = 0
+        self.version += 1
+
+    def copy(self):
+        """Return an independent copy of the field, used to try out placements."""
+        field = Field(self.width, self.height)
+        field.rows = self.rows[:]
+        field.colors = self.colors[:]
+        field.columns = self.columns[:]
+        field.heights = self.heights[:]
+        field.filled = self.filled
+        return field
+
+    @property
+    def holes(self):
+        """Number of empty cells with a block somewhere above them."""
+        return sum(self.heights) - self.filled
+
+    def drop_distance(self, bottoms, x, y):
+        """Rows a piece can fall, given the lowest (dx, dy) block of each of its columns and its position."""
+        height, distance = self.height, float('inf')  # Blocks above the field can fall more than height rows
+        for dx, dy in bottoms:
+            column, bottom = self.columns[x + dx], y + dy
+            if bottom >= 0:
+                column >>= bottom + 1  # Only the rows below the block matter
+                floor = bottom + 1 + (column & -column).bit_length() - 1 if column else height
+            else:
+                floor = (column & -column).bit_length() - 1 if column else height
+            distance = min(distance, floor - bottom - 1)  # First occupied row (or the floor) below the block
+        return distance
+
+    def is_collide(self, x, y):
+        """Check if cell (x, y) is outside the walls/floor or already occupied."""
+        if x < 0 or x >= self.width or y >= self.height:
+            return True  # Colliding with walls or bottom
+        return y >= 0 and self.rows[y] >> x & 1 == 1  # Colliding with an existing block (above the field is free)
+
+    def is_collide_masks(self, row_masks, min_x, max_x, x, y):
+        """Check a piece given as per-row bitmasks (relative to its leftmost column) placed at (x, y)."""
+        if x + min_x < 0 or x + max_x >= self.width:
+            return True  # Colliding with walls
+        rows, height, shift = self.rows, self.height, x + min_x
+        for dy, mask in row_masks:
+            row = y + dy
+            if row >= height:
+                return True  # Colliding with bottom
+            if row >= 0 and rows[row] & mask << shift:
+                return True  # Colliding with existing blocks
+        return False
+
+    def place(self, cells, color):
+        """Lock the given (x, y) cells into the field with a single tile colour."""
+        rows, colors, width = self.rows, self.colors, self.width
+        columns, heights, height = self.columns, self.heights, self.height
+        for x, y in cells:
+            if y >= 0:  # Only update if inside the visible field
+                if not rows[y] >> x & 1:
+                    self.filled += 1
+                rows[y] |= 1 << x
+                colors[y * width + x] = color
+                columns[x] |= 1 << y
+                if height - y > heights[x]:
+                    heights[x] = height - y
+        self.version += 1
+
+    def clear_full_lines(self):
+        """Remove every full row, shift the rows above down, and return the cleared rows as (y, colours) pairs."""
+        rows, full = self.rows, self.full_mask
+        if full not in rows:
+            return []  # Fast path: no row is complete
+
+        width = self.width
+        cleared = []  # Cleared rows with their colours, for the disappearing effect
+        kept_rows = []  # Bitmasks of the rows that survive
+        kept_colors = []  # Colour slices of the rows that survive
+        for y, row in enumerate(rows):
+            row_colors = self.colors[y * width:(y + 1) * width]
+            if row == full:
+                cleared.append((y, row_colors))
+            else:
+                kept_rows.append(row)
+                kept_colors.append(row_colors)
+
+        lines = len(cleared)
+        self.rows = [0] * lines + kept_rows  # Empty rows enter at the top
+        self.colors = bytearray(lines * width) + b''.join(kept_colors)
+
+        columns = self.columns
+        for y, _ in cleared:  # Top to bottom, so rows below a cleared row keep their index
+            above, below = (1 << y) - 1, ~((1 << (y + 1)) - 1)
+            columns = [(column & above) << 1 | column & below for column in columns]
+        self.columns = columns
+        self.heights = [self.height - (column & -column).bit_length() + 1 if column else 0 for column in columns]
+        self.filled -= lines * width
+        self.version += 1
+        return cleared
+
+    def cells(self):
+        """Yield (x, y, colour) for every occupied cell, used to derive the sprites for rendering."""
+        width, colors = self.width, self.colors
+        for y, row in enumerate(self.rows):
+            x = 0
+            while row:
+                if row & 1:
+                    yield x, y, colors[y * width + x]
+                row >>= 1
+                x += 1
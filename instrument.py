@@ -0,0 +1,130 @@
+from settings import *  # Import all configuration settings
+from array import array  # Fixed-size numeric ring buffers
+import json  # Export file format
+import logging  # Leveled logging replacing the debug prints
+import time  # High resolution timer for the frame phases
+
+
+class FrameStats:
+    """Per-phase frame timings and per-subsystem counters kept in fixed-size ring buffers."""
+    def __init__(self, size=STATS_FRAMES, phases=STATS_PHASES, counters=STATS_COUNTERS):
+        self.size = size  # Number of frames kept
+        self.timings = {name: array('d', [0.0]) * size for name in phases}  # Phase -> milliseconds per frame
+        self.counters = {name: array('l', [0]) * size for name in counters}  # Counter -> events per frame
+        self.counts = dict.fromkeys(counters, 0)  # Events counted in the current frame
+        self.frames = 0  # Frames recorded so far; frame i lives at index i % size
+        self.last_mark = time.perf_counter()  # End of the last timed phase
+
+    def start_frame(self):
+        """Start timing a new frame."""
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """Add the time since the last mark to the given phase of the current frame."""
+        now = time.perf_counter()
+        self.timings[phase][self.frames % self.size] += (now - self.last_mark) * 1000
+        self.last_mark = now
+
+    def count(self, counter, n=1):
+        """Count events of a subsystem in the current frame."""
+        self.counts[counter] += n
+
+    def watch(self, obj, method, counter):
+        """Count every call of a method of one object, leaving the class (and headless bots) untouched."""
+        original = getattr(obj, method)
+        counts = self.counts
+
+        def counted(*args):
+            counts[counter] += 1
+            return original(*args)
+        setattr(obj, method, counted)
+
+    def end_frame(self):
+        """Store the counters of the current frame and clear the next slot of the ring buffers."""
+        i = self.frames % self.size
+        for name, value in self.counts.items():
+            self.counters[name][i] = value
+            self.counts[name] = 0
+        self.frames += 1
+        for timing in self.timings.values():
+            timing[self.frames % self.size] = 0.0  # Phases add up into the slot of the next frame
+
+    def last(self, phase):
+        """Time spent in a phase during the last finished frame."""
+        return self.timings[phase][(self.frames - 1) % self.size]
+
+    def work(self, i):
+        """Time of the frame at ring index i spent on anything but sleeping until input or the next tick."""
+        return sum(timing[i] for name, timing in self.timings.items() if name != 'wait')
+
+    def indices(self):
+        """Ring indices of the recorded frames, oldest first."""
+        count = min(self.frames, self.size)
+        return [(self.frames - count + k) % self.size for k in range(count)]
+
+    def series(self, name):
+        """Values of a phase, counter or 'frame'/'work' totals over the recorded frames, oldest first."""
+        if name == 'frame':
+            return [sum(timing[i] for timing in self.timings.values()) for i in self.indices()]
+        if name == 'work':
+            return [self.work(i) for i in self.indices()]
+        values = self.timings.get(name) or self.counters[name]
+        return [values[i] for i in self.indices()]
+
+    def percentile(self, name, p):
+        """The p-th percentile (0-100) of a series, or 0 when nothing was recorded."""
+        values = sorted(self.series(name))
+        return values[round(p / 100 * (len(values) - 1))] if values else 0
+
+    def summary(self):
+        """p50/p99 of the frame, work and phase times and the mean of every counter per frame."""
+        frames = min(self.frames, self.size)
+        summary = {'frames': frames}
+        for name in ('frame', 'work', *self.timings):
+            summary[name] = {'p50': self.percentile(name, 50), 'p99': self.percentile(name, 99)}
+        for name in self.counters:
+            summary[name] = sum(self.series(name)) / frames if frames else 0
+        return summary
+
+    def export(self, path):
+        """Write the summary and every recorded frame to a JSON file."""
+        data = {
+            'summary': self.summary(),
+            'timings': {name: self.series(name) for name in self.timings},  # Milliseconds, oldest frame first
+            'counters': {name: self.series(name) for name in self.counters}
+        }
+        with open(path, 'w') as file:
+            json.dump(data, file)
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops repeats of a log message arriving within the interval after the last one let through."""
+    def __init__(self, interval=LOG_INTERVAL):
+        super().__init__()
+        self.interval = interval  # Minimum seconds between two records of the same message
+        self.last = {}  # (logger, message) -> (time let through, repeats dropped since)
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        last, dropped = self.last.get(key, (None, 0))
+        if last is not None and now - last < self.interval:
+            self.last[key] = (last, dropped + 1)
+            return False
+        if dropped:
+            record.dropped = f' ({dropped} similar suppressed)'
+        self.last[key] = (now, 0)
+        return True
+
+
+def get_logger(name):
+    """Return a logger under the game's 'tetris' logger, setting up its rate-limited handler on first use."""
+    root = logging.getLogger('tetris')
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.addFilter(RateLimitFilter())
+        handler.setFormatter(logging.Formatter('%(levelname)s %(name)s: %(message)s%(dropped)s',
+                                               defaults={'dropped': ''}))
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+    return logging.getLogger(f'tetris.{name}')
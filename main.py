@@ -1,82 +1,242 @@
 from settings import *  # Import all configuration settings
-from tetris import Tetris, Text  # Import Tetris game logic and Text display class
+from tetris import Tetris  # Import headless Tetris game logic
+from render import Renderer  # Import the Pygame renderer
+from replay import Recorder, Player  # Import replay recording and playback
+from instrument import FrameStats, get_logger  # Frame timing ring buffer and logging
+from assets import load_assets  # Pre-scaled asset bundle
+from snapshot import snapshot, restore  # Fixed-layout game state for save games and undo
+import pygame as pg  # Import Pygame for the window, input and clock
 import sys  # System-specific parameters and functions
 import pathlib  # For file and directory path manipulations
+import argparse  # For command-line options
+import time  # For naming replay files
+import logging  # For setting the log level from the command line
+import math  # For rounding sleep times up to the clock resolution
+from collections import deque  # Bounded undo history
+
+log = get_logger('main')
+
+
+KEY_ACTIONS = {
+    pg.K_LEFT: 'left',  # Move left
+    pg.K_RIGHT: 'right',  # Move right
+    pg.K_UP: 'rotate',  # Rotate tetromino
+    pg.K_DOWN: 'down',  # Fast fall
+    pg.K_SPACE: 'drop',  # Hard drop
+    pg.K_p: 'pause'  # Pause/Resume
+}
+
+
+def positive_float(text):
+    """argparse type for multipliers: a finite float above 0."""
+    value = float(text)
+    if not (math.isfinite(value) and value > 0):
+        raise argparse.ArgumentTypeError(f'must be a finite number above 0, got {text}')  # 0 or inf would stall the tick loop, a negative speed runs time backwards
+    return value
 
 
 class App:
-    """Main application class for running the Tetris game."""
-    
-    def __init__(self):
+    """Main application class: a thin Pygame front end over the headless Tetris core."""
+
+    def __init__(self, replay=None, speed=1, stats_path=STATS_PATH, uncapped=False, practice=False):
         pg.init()  # Initialize all Pygame modules
         pg.display.set_caption('Tetris')  # Set the window title
         self.screen = pg.display.set_mode(WIN_RES)  # Set the game screen resolution
         self.clock = pg.time.Clock()  # Initialize the clock for frame rate control
-        self.set_timer()  # Set up timer events for animation
         self.font = pg.font.SysFont('Arial', 20)  # Load a system font for rendering text
-        self.images = self.load_images()  # Load and scale block images
-        self.tetris = Tetris(self)  # Create an instance of the Tetris game
-        self.text = Text(self)  # Create an instance of the Text rendering class
+        self.images, self.background = self.load_images()  # Block images and background scaled to the window
+        self.replay = replay  # Replay file being played back, if any
+        self.speed = speed  # Game time multiplier (replay playback speed)
+        self.stats_path = stats_path  # File the frame stats are exported to on exit
+        self.uncapped = uncapped  # Never sleep and draw every frame, for benchmarking
+        self.practice = practice  # Backspace takes back Tetrominoes (off in normal play)
+        self.next_tick_time = 0  # pg.time.get_ticks() time the next tick is due
+        self.last_draw_time = 0  # pg.time.get_ticks() time of the last drawn frame
+        self.resting = False  # The last update found the game idle and ran no ticks
+        self.stats = FrameStats()  # Per-phase frame timings and per-subsystem counters
+        self.player = Player.load(replay) if replay else None  # Feeds recorded actions during playback
+        self.new_game()
+        self.renderer = Renderer(self)  # Create the renderer drawing the game
+
+    def new_game(self):
+        """Start a new game (or the replayed one again), keeping the window and the loaded assets."""
+        self.tetris = self.player.new_game() if self.player else Tetris()  # Create an instance of the Tetris game
+        self.recorder = None if self.player else Recorder(self.tetris)  # Records the inputs of a live game
+        self.stats.watch(self.tetris.field, 'is_collide_masks', 'collisions')  # Count collision checks
+        self.stats.watch(self.tetris.field, 'is_collide', 'collisions')
+        self.replay_saved = False  # Whether the replay of this game was written already
+        self.undo = deque(maxlen=UNDO_DEPTH)  # Snapshots taken when each of the last locked Tetrominoes appeared
+        self.piece_state = snapshot(self.tetris)  # Snapshot taken when the current Tetromino appeared
+        self.actions = []  # Player actions queued for the next tick
+        self.tick_time = 0  # Game time not yet simulated (in milliseconds)
+
+    def restart(self):
+        """Soft reset after Game Over: only the game state is rebuilt, the renderer keeps its layers and caches."""
+        self.new_game()
+        self.renderer.reset()
 
     def load_images(self):
-        """Load all PNG images from the sprite directory and scale them."""
-        files = [item for item in pathlib.Path(SPRITE_DIR_PATH).rglob('*.png') if item.is_file()]
-        images = [pg.image.load(file).convert_alpha() for file in files]  # Load images with alpha transparency
-        images = [pg.transform.scale(image, (TILE_SIZE, TILE_SIZE)) for image in images]  # Resize images
-        return images
-
-    def set_timer(self):
-        """Set timers for regular and fast falling animation events."""
-        self.user_event = pg.USEREVENT + 0  # Custom event for normal fall
-        self.fast_user_event = pg.USEREVENT + 1  # Custom event for fast fall
-        self.anim_trigger = False  # Flag for normal fall animation
-        self.fast_anim_trigger = False  # Flag for fast fall animation
-        pg.time.set_timer(self.user_event, ANIM_TIME_INTERVAL)  # Set timer for normal fall
-        pg.time.set_timer(self.fast_user_event, FAST_ANIM_TIME_INTERVAL)  # Set timer for fast fall
+        """Load the block images scaled to TILE_SIZE and the background scaled to the window, from the asset bundle."""
+        return load_assets(self.screen.get_size())
+
+    def idle(self):
+        """Check if the game cannot change until P, R, F9 or Backspace (paused, over or end of replay)."""
+        if self.player:
+            return self.player.done(self.tetris)  # Recorded pauses are replayed tick by tick
+        return (self.tetris.paused or self.tetris.game_over) and 'pause' not in self.actions
+
+    def wait_time(self):
+        """Milliseconds the loop may sleep before a tick or frame is due; input wakes it earlier."""
+        if self.uncapped:
+            return 0
+        if self.idle():
+            return IDLE_WAKE_TIME
+        now = pg.time.get_ticks()
+        return max(self.next_tick_time - now, self.last_draw_time + 1000 / FPS - now, 0)
+
+    def wait(self):
+        """Sleep until input arrives or the next tick or frame is due, and return the pending events."""
+        timeout = math.ceil(self.wait_time())
+        events = [pg.event.wait(timeout)] if timeout > 0 else []
+        self.stats.mark('wait')  # Time spent sleeping
+        return [event for event in events if event.type != pg.NOEVENT] + pg.event.get()
 
     def update(self):
-        """Update the game state and control the frame rate."""
-        self.tetris.update()  # Update Tetris game logic
-        self.clock.tick(FPS)  # Limit the frame rate
+        """Run every logical tick that is due; none while the game is idle."""
+        elapsed = min(self.clock.tick(), MAX_FRAME_TIME) * self.speed  # Game time since the last update
+        now = pg.time.get_ticks()  # Same clock reading as the tick above, so no time is lost to the ticks below
+        if self.idle():
+            self.tick_time = 0  # Nothing to simulate until the player resumes, restarts or loads a game
+            self.actions = []  # Only P acts on a paused or finished game
+            self.resting = True
+        else:
+            self.tick_time += TICK_TIME_INTERVAL if self.resting else elapsed  # Input after a rest runs at once
+            self.resting = False
+        while self.tick_time >= TICK_TIME_INTERVAL:
+            self.tick_time -= TICK_TIME_INTERVAL
+            if self.player:
+                if self.player.done(self.tetris):
+                    self.tick_time = 0  # The recording is over, keep showing the last state
+                    break
+                self.tetris.step(self.player.actions_for(self.tetris.ticks + 1))  # Replay the recorded tick
+            else:
+                version = self.tetris.field.version
+                (self.recorder or self.tetris).step(self.actions)  # Advance the game by one fixed tick
+                self.actions = []  # Actions are only applied once
+                if self.practice and self.tetris.field.version != version:
+                    self.undo.append(self.piece_state)  # A Tetromino locked: undo goes back to when it appeared (practice only)
+                    self.piece_state = snapshot(self.tetris)  # One snapshot per Tetromino, not per tick
+            self.stats.count('ticks')
+            self.stats.count('lines', len(self.tetris.cleared_rows))
+            self.renderer.update()  # Sync the sprites with the new state
+        self.next_tick_time = now + math.ceil((TICK_TIME_INTERVAL - self.tick_time) / self.speed)  # Whole milliseconds
+        if self.tetris.game_over:
+            self.save_replay()
+
+    def save_replay(self):
+        """Write the replay of the live game to REPLAY_DIR, once."""
+        if self.recorder and not self.replay_saved:
+            pathlib.Path(REPLAY_DIR).mkdir(exist_ok=True)
+            path = f"{REPLAY_DIR}/{time.strftime('%Y%m%d-%H%M%S')}-{self.tetris.seed}.trp"
+            self.recorder.save(path)
+            self.replay_saved = True
+            log.info('Replay saved to %s', path)
+
+    def save_game(self):
+        """Write the state of the live game to SAVE_PATH."""
+        pathlib.Path(SAVE_PATH).parent.mkdir(exist_ok=True)
+        with open(SAVE_PATH, 'wb') as file:
+            file.write(snapshot(self.tetris))
+        log.info('Game saved to %s', SAVE_PATH)
+
+    def load_game(self, data):
+        """Continue from a snapshot; the replay stops recording since it could no longer reproduce the game."""
+        restore(self.tetris, data)
+        self.piece_state = data  # Undo after this goes back to the loaded state
+        if self.recorder:
+            log.warning('Replay recording stopped after a game state was restored')
+        self.recorder = None
+        self.actions = []
+        self.renderer.reset()  # Layers are rebuilt on the next frame, from the new field version
+
+    def resume_game(self):
+        """Load the game saved in SAVE_PATH, if there is one."""
+        try:
+            with open(SAVE_PATH, 'rb') as file:
+                self.load_game(file.read())
+        except (OSError, ValueError) as error:
+            log.warning('No game loaded: %s', error)
+
+    def undo_lock(self):
+        """Go back to when the last locked Tetromino appeared (practice mode)."""
+        if self.undo:
+            self.load_game(self.undo.pop())
+
+    def save_stats(self):
+        """Export the recorded frame stats, if a stats file was given."""
+        if self.stats_path:
+            self.stats.export(self.stats_path)
+            log.info('Frame stats saved to %s', self.stats_path)
+
+    def check_slow_frame(self):
+        """Log frames whose work took longer than SLOW_FRAME_TIME, with the time of every phase."""
+        work = sum(self.stats.last(phase) for phase in STATS_PHASES if phase != 'wait')
+        if work > SLOW_FRAME_TIME:
+            log.warning('Slow frame: %.1f ms (events %.1f, update %.1f, draw %.1f)', work,
+                        self.stats.last('events'), self.stats.last('update'), self.stats.last('draw'))
 
     def draw(self):
         """Render the background, game field, and text to the screen."""
-        bg_image = pg.image.load("assets/bg.png").convert()  # Load and convert background image
-        bg_image = pg.transform.scale(bg_image, WIN_RES)  # Scale background image to screen size
-        self.screen.blit(bg_image, (0, 0))  # Draw the background
-        self.tetris.draw()  # Draw the Tetris field
-        self.text.draw()  # Draw the text (e.g., score, title)
-        pg.display.flip()  # Update the full display
-
-    def check_events(self):
-        """Handle all incoming Pygame events."""
-        self.anim_trigger = False  # Reset normal animation trigger
-        self.fast_anim_trigger = False  # Reset fast animation trigger
-        for event in pg.event.get():
+        self.renderer.draw()
+        self.last_draw_time = pg.time.get_ticks()
+
+    def check_events(self, events=None):
+        """Handle the given Pygame events, or all incoming ones."""
+        for event in pg.event.get() if events is None else events:
             if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
                 # Exit the game cleanly
+                self.save_replay()
+                self.save_stats()
                 pg.quit()
                 sys.exit()
             elif event.type == pg.KEYDOWN:
-                if event.key == pg.K_p:
-                    self.tetris.toggle_pause()  # Pause or resume the game
-                elif event.key == pg.K_r and self.tetris.game_over:
-                    self.__init__()  # Reinitialize the game after Game Over
-                else:
-                    self.tetris.control(pressed_key=event.key)  # Handle Tetromino movement and rotation
-            elif event.type == self.user_event:
-                self.anim_trigger = True  # Trigger normal falling
-            elif event.type == self.fast_user_event:
-                self.fast_anim_trigger = True  # Trigger fast falling
+                if event.key == pg.K_r and self.tetris.game_over:
+                    self.restart()  # Start a new game after Game Over
+                elif event.key == pg.K_F3:
+                    self.renderer.show_stats = not self.renderer.show_stats  # Toggle the frame stats overlay
+                elif event.key == pg.K_F5 and not self.player:
+                    self.save_game()  # Save the game
+                elif event.key == pg.K_F9 and not self.player:
+                    self.resume_game()  # Continue the saved game
+                elif event.key == pg.K_BACKSPACE and self.practice and not self.player:
+                    self.undo_lock()  # Take back the last Tetromino
+                elif event.key in KEY_ACTIONS and not self.player:
+                    self.actions.append(KEY_ACTIONS[event.key])  # Handle Tetromino movement and rotation
 
     def run(self):
-        """Main game loop."""
+        """Main game loop: sleep until input or a due tick, simulate, and draw only what changed."""
         while True:
-            self.check_events()  # Handle user input and system events
+            self.stats.start_frame()
+            self.check_events(self.wait())  # Handle user input and system events
+            self.stats.mark('events')
             self.update()  # Update game logic
-            self.draw()  # Draw everything on the screen
+            self.stats.mark('update')
+            if self.uncapped or self.renderer.needs_draw():
+                self.draw()  # Draw everything on the screen
+            self.stats.mark('draw')
+            self.stats.end_frame()
+            self.check_slow_frame()
 
 # Start the game when the script is executed
 if __name__ == '__main__':
-    app = App()
-    app.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Tetris')
+    parser.add_argument('--replay', help='play back a recorded .trp replay instead of a live game')
+    parser.add_argument('--speed', type=positive_float, default=1, help='game speed multiplier for replay playback')
+    parser.add_argument('--stats', default=STATS_PATH, help='export frame timings and counters to this JSON file on exit')
+    parser.add_argument('--log-level', default=LOG_LEVEL, help='DEBUG, INFO, WARNING or ERROR')
+    parser.add_argument('--uncapped', action='store_true', help='never sleep and draw every frame (benchmarking)')
+    parser.add_argument('--practice', action='store_true', help='practice mode: Backspace takes back the last Tetromino (ends the replay recording)')
+    args = parser.parse_args()
+    logging.getLogger('tetris').setLevel(args.log_level.upper())
+    app = App(args.replay, args.speed, args.stats, args.uncapped, args.practice)
+    app.run()
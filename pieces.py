@@ -0,0 +1,66 @@
+from settings import *  # Import all configuration settings
+
+MASK_64 = (1 << 64) - 1  # Keep PRNG arithmetic in 64 bits
+SHAPES = list(TETROMINOES.keys())  # Shape names in a fixed order, indexed by the PRNG
+
+
+def splitmix64(value):
+    """Scramble a seed into a well mixed, non-zero 64-bit PRNG state."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK_64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return (value ^ (value >> 31)) or 1  # xorshift must never hold a zero state
+
+
+class XorShift:
+    """Small xorshift64* PRNG: seedable, reproducible everywhere, and its whole state is one integer."""
+    def __init__(self, seed):
+        self.state = splitmix64(seed)  # Current 64-bit state
+
+    def next(self):
+        """Advance the state and return the next 64-bit random value."""
+        x = self.state
+        x ^= x >> 12
+        x ^= (x << 25) & MASK_64
+        x ^= x >> 27
+        self.state = x
+        return (x * 0x2545F4914F6CDD1D) & MASK_64
+
+    def randrange(self, n):
+        """Return a random integer in range(n)."""
+        return (self.next() >> 32) % n
+
+
+class RandomPieces:
+    """Piece source drawing every shape and tile colour independently at random."""
+    name = 'random'  # Name used in settings and replay files
+
+    def __init__(self, seed):
+        self.seed = seed  # Seed the source was created with
+        self.random = XorShift(seed)  # Random generator for shapes and colours
+
+    def next_piece(self):
+        """Return the (shape, colour) of the next Tetromino."""
+        shape = SHAPES[self.random.randrange(len(SHAPES))]
+        return shape, self.random.randrange(TILE_COUNT)
+
+
+class BagPieces(RandomPieces):
+    """Piece source dealing shuffled bags holding each of the seven shapes once."""
+    name = 'bag'  # Name used in settings and replay files
+
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.bag = []  # Shapes left in the current bag, dealt from the end
+
+    def next_piece(self):
+        """Return the (shape, colour) of the next Tetromino, refilling the bag when it is empty."""
+        if not self.bag:
+            self.bag = SHAPES[:]
+            for i in range(len(self.bag) - 1, 0, -1):  # Fisher-Yates shuffle
+                j = self.random.randrange(i + 1)
+                self.bag[i], self.bag[j] = self.bag[j], self.bag[i]
+        return self.bag.pop(), self.random.randrange(TILE_COUNT)
+
+
+PIECE_SOURCES = {source.name: source for source in (RandomPieces, BagPieces)}  # Piece sources by name
@@ -0,0 +1,387 @@
+from settings import *  # Import all configuration settings
+import math  # Import math functions for color animation
+import random  # Import random module for randomizing the disappearing effect
+import pygame as pg  # Import Pygame for drawing
+import pygame.freetype as ft  # Import Pygame freetype module for rendering text
+from collections import OrderedDict  # Ordered mapping used for the LRU text cache
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by font, text, size and colour."""
+    def __init__(self, capacity=TEXT_CACHE_SIZE, stats=None):
+        self.capacity = capacity  # Maximum number of surfaces kept
+        self.stats = stats  # FrameStats counting the rasterised texts, if any
+        self.surfaces = OrderedDict()  # Rendered surfaces, least recently used first
+        self.fonts = {}  # System fonts by (name, size), created once
+
+    def sys_font(self, name, size):
+        """Return a system font, creating it only on first use."""
+        key = (name, size)
+        if key not in self.fonts:
+            self.fonts[key] = pg.font.SysFont(name, size)
+        return self.fonts[key]
+
+    def render(self, font, text, color, size=0, bgcolor=None):
+        """Return the surface for the text, rasterising it only when it is not cached."""
+        key = (font, text, color, size, bgcolor)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)  # Mark as most recently used
+            return surface
+
+        if isinstance(font, ft.Font):
+            surface, _ = font.render(text, fgcolor=color, bgcolor=bgcolor, size=size)
+        else:
+            surface = font.render(text, True, color, bgcolor)  # pg.font.Font, size is part of the font
+        if self.stats:
+            self.stats.count('text_renders')
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)  # Evict the least recently used surface
+        return surface
+
+
+class Text:
+    """Class responsible for rendering dynamic UI text (title, score, next piece) in the game."""
+    def __init__(self, app, cache):
+        self.app = app  # Reference to the main App object
+        self.cache = cache  # Cache of rendered text surfaces
+        self.font = ft.Font(FONT_PATH)  # Load custom font for rendering text
+        self.palette = self.get_palette()  # Precomputed colour animation cycle
+        self.tint_color = None  # Palette colour of the tinted labels
+        self.tints = {}  # (text, size) -> label tinted with tint_color
+
+    def get_palette(self):
+        """Precompute one cycle of the sine wave colour animation as integer RGB colours."""
+        n_sin = lambda t: int((math.sin(t) * 0.5 + 0.5) * 255)  # Normalize sine wave output to 0-255 range
+        palette = []
+        for i in range(PALETTE_SIZE):
+            time = PALETTE_CYCLE_TIME * 0.001 * i / PALETTE_SIZE  # Time of this step in seconds
+            palette.append((n_sin(time * 0.5), n_sin(time * 0.2), n_sin(time * 0.9)))
+        return palette
+
+    def get_color(self):
+        """Pick the current colour of the animation cycle, so repeated frames reuse cached surfaces."""
+        step = pg.time.get_ticks() * PALETTE_SIZE // PALETTE_CYCLE_TIME  # Palette steps elapsed
+        return self.palette[step % PALETTE_SIZE]
+
+    def render_to(self, pos, text, color, size, bgcolor=None):
+        """Blit the cached surface of the text at the given position, returning the drawn rect."""
+        return self.app.screen.blit(self.cache.render(self.font, text, color, size, bgcolor), pos)
+
+    def tinted(self, text, size, color):
+        """Return a label on black in a palette colour: its white rendering, rasterised once, multiplied by the colour."""
+        if color != self.tint_color:
+            self.tint_color, self.tints = color, {}  # Only the current palette step is kept
+        surface = self.tints.get((text, size))
+        if surface is None:
+            surface = self.cache.render(self.font, text, 'white', size, 'black').copy()
+            surface.fill(color, special_flags=pg.BLEND_RGB_MULT)  # Coverage * colour, as if rendered in the colour
+            self.tints[(text, size)] = surface
+        return surface
+
+    def draw(self):
+        """Render the Tetris title, next piece label, and score display, returning the drawn rects."""
+        color = self.get_color()
+        return [
+            self.app.screen.blit(self.tinted('TETRIS', TILE_SIZE * 1.65, color), (WIN_W * 0.595, WIN_H * 0.02)),
+            self.app.screen.blit(self.tinted('next', TILE_SIZE * 1.4, color), (WIN_W * 0.65, WIN_H * 0.22)),
+            self.app.screen.blit(self.tinted('score', TILE_SIZE * 1.4, color), (WIN_W * 0.64, WIN_H * 0.67)),
+            self.render_to((WIN_W * 0.64, WIN_H * 0.8), f'{self.app.tetris.score}', 'white', TILE_SIZE * 1.8)
+        ]
+
+
+class Block(pg.sprite.Sprite):
+    """A single block from a cleared row, playing the disappearing effect; reused from the renderer's pool."""
+    def __init__(self, renderer):
+        super().__init__()
+        self.renderer = renderer  # Reference to the Renderer owning the sprite group and the pool
+        self.rect = pg.Rect(0, 0, TILE_SIZE, TILE_SIZE)  # Rect object for positioning on screen
+
+    def reset(self, pos, color):
+        """Start the disappearing effect of a tile of the given colour at a field position."""
+        self.x, self.y = pos  # Position on the field grid
+        self.frames = self.renderer.sfx_frames[color % len(self.renderer.sfx_frames)]  # Pre-rotated faded tiles
+        self.image = self.frames[0]  # Visual appearance of the block
+        self.sfx_speed = self.renderer.random.uniform(0.2, 0.6)  # Random speed for the disappearing effect
+        self.sfx_cycles = self.renderer.random.randrange(6, 8)  # Number of animation cycles
+        self.cycle_counter = 0  # Counter for tracking animation cycles
+        self.add(self.renderer.sprite_group)  # Add block to the sprite group
+        return self
+
+    def sfx_end_time(self):
+        """Handle timing for the disappearing animation."""
+        if self.renderer.app.tetris.anim_trigger:
+            self.cycle_counter += 1
+            if self.cycle_counter > self.sfx_cycles:
+                self.cycle_counter = 0
+                return True
+        return False
+
+    def sfx_run(self):
+        """Apply the fading and rotation animation."""
+        self.y -= self.sfx_speed  # Move the block upwards slowly
+        angle = pg.time.get_ticks() * self.sfx_speed  # Rotation angle in degrees
+        self.image = self.frames[int(angle * SFX_ANGLE_STEPS / 360) % SFX_ANGLE_STEPS]  # Nearest pre-rotated frame
+
+    def is_alive(self):
+        """Animate the block, then remove it once the effect is finished."""
+        if not self.sfx_end_time():
+            self.sfx_run()
+        else:
+            self.kill()  # Remove the block from the game
+
+    def kill(self):
+        """Remove the block from its groups and return it to the pool."""
+        super().kill()
+        self.renderer.block_pool.append(self)
+
+    def set_rect_pos(self):
+        """Update the block’s rect position for drawing."""
+        self.rect.topleft = (self.x * TILE_SIZE, self.y * TILE_SIZE)  # Update top-left corner position
+
+    def update(self):
+        """Update the block each tick: run the effect and position."""
+        self.is_alive()
+        self.set_rect_pos()
+
+
+class Renderer:
+    """Draws the state of a headless Tetris game onto the app screen from cached layers."""
+    def __init__(self, app):
+        self.app = app  # Reference to the main App object
+        self.sprite_group = pg.sprite.Group()  # Group holding the disappearing-effect blocks
+        self.random = random.Random(app.tetris.seed)  # Effect randomness, seeded like the game so replays look alike
+        self.text_cache = TextCache(stats=app.stats)  # Rendered text surfaces shared by the HUD and overlays
+        self.text = Text(app, self.text_cache)  # Text rendering for title, next piece and score
+
+        self.theme = BG_PATH  # Background image used for the static layer
+        self.layer_key = None  # (screen size, theme) the static layer was built for
+        self.static_layer = None  # Scaled background with the grid drawn on top
+        self.field_layer = None  # Static layer plus the landed blocks
+        self.field_key = None  # (field, version) the field layer was built for
+        self.ghost_images = {}  # Colour -> see-through tile for the ghost piece
+        self.sfx_frames = self.build_sfx_frames()  # Tile image -> faded tile rotated to every angle step
+        self.block_pool = []  # Finished effect blocks waiting to be reused
+        self.overlay = None  # Overlay (pause/game over) shown in the last frame
+        self.dirty_rects = []  # Screen areas drawn over the layers in the last frame
+        self.full_redraw = True  # Redraw and flip the whole screen on the next frame
+        self.drawn_key = None  # frame_key() of the last drawn frame
+
+        self.show_stats = False  # Draw the frame stats overlay (toggled with F3)
+        self.stats_graph = pg.Surface(STATS_GRAPH_SIZE)  # Scrolling frame time graph, one column per frame
+        self.stats_graph.fill(BLACK)
+        self.stats_text = []  # Overlay text lines, refreshed every STATS_REFRESH_FRAMES frames
+
+    def build_sfx_frames(self):
+        """Rotate a faded copy of every tile image to each angle step once, for the line clear effect."""
+        frames = []
+        for image in self.app.images:
+            image_frames = []
+            for step in range(SFX_ANGLE_STEPS):
+                frame = pg.transform.rotate(image, step * 360 / SFX_ANGLE_STEPS)
+                frame.set_alpha(SFX_ALPHA)  # Semi-transparent like the original effect image
+                image_frames.append(frame)
+            frames.append(image_frames)
+        return frames
+
+    def get_block(self, pos, color):
+        """Take an effect block from the pool, or create one when the pool is empty."""
+        block = self.block_pool.pop() if self.block_pool else Block(self)
+        return block.reset(pos, color)
+
+    def reset(self):
+        """Prepare for a new game on the same window; the layers and image caches stay valid."""
+        for block in self.sprite_group.sprites():
+            block.kill()  # Back to the pool
+        self.random.seed(self.app.tetris.seed)
+        self.overlay = None
+        self.full_redraw = True
+
+    def set_theme(self, bg_path):
+        """Switch the background image; the static layers are rebuilt on the next frame."""
+        self.theme = bg_path
+
+    def update(self):
+        """Sync the sprites with the last simulated tick."""
+        for y, colors in self.app.tetris.cleared_rows:
+            for x, color in enumerate(colors):
+                self.get_block((x, y), color)  # Sprite only used for the effect
+        if self.sprite_group and not (self.app.tetris.paused or self.app.tetris.game_over):
+            self.sprite_group.update()  # Update all effect sprites
+
+    def build_static_layer(self):
+        """Scale the background and draw the grid once, for the current resolution and theme."""
+        size = self.app.screen.get_size()
+        if self.theme == BG_PATH and self.app.background.get_size() == size:
+            self.static_layer = self.app.background.copy()  # Pre-scaled in the asset bundle
+        else:
+            bg_image = pg.image.load(self.theme).convert()  # Load and convert background image
+            self.static_layer = pg.transform.scale(bg_image, size)  # Scale background image to screen size
+        self.draw_grid(self.static_layer)
+        self.layer_key = (size, self.theme)
+        self.field_key = None  # The field layer sits on top of the static layer
+        self.full_redraw = True
+        self.app.stats.count('layer_builds')
+
+    def build_field_layer(self):
+        """Draw the landed blocks over a copy of the static layer."""
+        self.field_layer = self.static_layer.copy()
+        self.draw_field(self.field_layer)
+        self.field_key = (self.app.tetris.field, self.app.tetris.field.version)
+        self.full_redraw = True
+        self.app.stats.count('layer_builds')
+
+    def check_layers(self):
+        """Rebuild the cached layers that no longer match the screen, theme or field."""
+        if self.layer_key != (self.app.screen.get_size(), self.theme):
+            self.build_static_layer()
+        if self.field_key != (self.app.tetris.field, self.app.tetris.field.version):
+            self.build_field_layer()
+
+    def draw_grid(self, surface):
+        """Draw the grid lines on the field."""
+        for x in range(FIELD_W):
+            for y in range(FIELD_H):
+                pg.draw.rect(surface, 'black',
+                             (x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE), 1)
+
+    def draw_field(self, surface):
+        """Draw the landed blocks straight from the bitboard field."""
+        images = self.app.images
+        for x, y, color in self.app.tetris.field.cells():
+            surface.blit(images[color % len(images)], (x * TILE_SIZE, y * TILE_SIZE))
+
+    def get_ghost_image(self, color):
+        """Return the see-through tile used for the ghost piece, made once per colour."""
+        if color not in self.ghost_images:
+            image = self.app.images[color % len(self.app.images)].copy()
+            image.set_alpha(GHOST_ALPHA)
+            self.ghost_images[color] = image
+        return self.ghost_images[color]
+
+    def draw_ghost(self, tetromino):
+        """Draw the ghost piece where the Tetromino would land, returning the drawn rects."""
+        image = self.get_ghost_image(tetromino.color)
+        distance = tetromino.drop_distance()  # Read from the field's column index
+        return [self.app.screen.blit(image, (x * TILE_SIZE, (y + distance) * TILE_SIZE))
+                for x, y in tetromino.blocks]
+
+    def draw_tetromino(self, tetromino):
+        """Draw a Tetromino on the field, or in the preview area when it is the next one, returning the drawn rects."""
+        image = self.app.images[tetromino.color % len(self.app.images)]
+        offset_x, offset_y = 0, 0  # The falling Tetromino is drawn at its field position
+        if not tetromino.current:
+            offset_x = NEXT_POS_OFFSET[0] - INIT_POS_OFFSET[0]  # Move the preview next to the field
+            offset_y = NEXT_POS_OFFSET[1] - INIT_POS_OFFSET[1]
+        return [self.app.screen.blit(image, ((x + offset_x) * TILE_SIZE, (y + offset_y) * TILE_SIZE))
+                for x, y in tetromino.blocks]
+
+    def frame_key(self):
+        """Everything a frame shows, apart from the line clear effect and the stats overlay."""
+        tetris = self.app.tetris
+        tetromino, upcoming = tetris.tetromino, tetris.next_tetromino
+        return (tetromino.shape, tetromino.color, tetromino.x, tetromino.y, tetromino.orientation,
+                upcoming.shape, upcoming.color, tetris.field, tetris.field.version, tetris.score,
+                tetris.paused, tetris.game_over, self.text.get_color(), self.theme, len(self.sprite_group))
+
+    def needs_draw(self):
+        """Check if the screen would change: the game state moved, the title colour stepped or an effect is playing."""
+        return self.full_redraw or self.show_stats or bool(self.sprite_group) or self.frame_key() != self.drawn_key
+
+    def draw(self):
+        """Compose the frame from the cached layers and update only the screen areas that changed."""
+        tetris = self.app.tetris
+        screen = self.app.screen
+        self.check_layers()
+        self.drawn_key = self.frame_key()
+
+        overlay = 'pause' if tetris.paused else 'game_over' if tetris.game_over else None
+        if overlay != self.overlay:
+            self.overlay = overlay
+            self.full_redraw = True  # Overlays cover the whole field
+
+        if self.full_redraw:
+            screen.blit(self.field_layer, (0, 0))  # Background, grid and landed blocks
+        else:
+            for rect in self.dirty_rects:
+                screen.blit(self.field_layer, rect, rect)  # Restore what was drawn over last frame
+
+        rects = []  # Screen areas drawn over the layers this frame
+        if tetris.tetromino:
+            if not tetris.game_over:
+                rects += self.draw_ghost(tetris.tetromino)
+            rects += self.draw_tetromino(tetris.tetromino)
+        rects += self.draw_tetromino(tetris.next_tetromino)
+        self.sprite_group.draw(screen)
+        rects += self.sprite_group.spritedict.values()
+
+        if overlay == 'pause':
+            rects += self.draw_pause()
+        elif overlay == 'game_over':
+            rects += self.draw_game_over()
+
+        rects += self.text.draw()  # Draw the text (e.g., score, title)
+        if self.show_stats:
+            rects += self.draw_stats()
+        self.app.stats.count('blits', len(rects) + (1 if self.full_redraw else len(self.dirty_rects)))
+
+        if self.full_redraw:
+            pg.display.flip()  # Update the full display
+            self.full_redraw = False
+        else:
+            pg.display.update(self.dirty_rects + rects)  # Update the old and new positions only
+        self.dirty_rects = rects
+
+    def draw_stats(self):
+        """Draw the frame time graph with the p50/p99 timings and counters, returning the drawn rects."""
+        stats = self.app.stats
+        graph_w, graph_h = STATS_GRAPH_SIZE
+        budget = 1000 / FPS  # Frame time at the target frame rate
+        if stats.frames:
+            frame = stats.work((stats.frames - 1) % stats.size)  # Work time of the last finished frame
+            self.stats_graph.scroll(-1, 0)  # Shift the graph left by one frame
+            self.stats_graph.fill(BLACK, (graph_w - 1, 0, 1, graph_h))
+            bar = min(graph_h, round(frame / (2 * budget) * graph_h))  # Half the height is the frame budget
+            self.stats_graph.fill(GREEN if frame <= budget else RED, (graph_w - 1, graph_h - bar, 1, bar))
+            self.stats_graph.set_at((graph_w - 1, graph_h // 2), WHITE)  # Frame budget line
+
+        if stats.frames % STATS_REFRESH_FRAMES == 0 or not self.stats_text:
+            summary = stats.summary()
+            counters = [f'{name} {summary[name]:.1f}' for name in STATS_COUNTERS]  # Mean per frame
+            self.stats_text = [f"frame p50 {summary['frame']['p50']:.1f} p99 {summary['frame']['p99']:.1f} ms",
+                               f"work p50 {summary['work']['p50']:.1f} p99 {summary['work']['p99']:.1f} ms",
+                               *[f"{name} p50 {summary[name]['p50']:.1f} p99 {summary[name]['p99']:.1f} ms"
+                                 for name in STATS_PHASES],
+                               ' '.join(counters[:3]), ' '.join(counters[3:])]
+
+        font = self.text_cache.sys_font('Arial', 14)
+        rects = [self.app.screen.blit(self.stats_graph, (0, 0))]
+        for i, line in enumerate(self.stats_text):
+            text = self.text_cache.render(font, line, WHITE, bgcolor=BLACK)
+            rects.append(self.app.screen.blit(text, (0, graph_h + i * font.get_linesize())))
+        return rects
+
+    def draw_pause(self):
+        """Draw the pause message on the screen, returning the drawn rects."""
+        pause_msg = self.text_cache.render(self.app.font, PAUSE_TEXT, YELLOW)
+        return [self.app.screen.blit(pause_msg, (WIN_W // 2 - pause_msg.get_width() // 2, WIN_H // 2))]
+
+    def draw_game_over(self):
+        """Draw the Game Over screen with restart instructions, returning the drawn rects."""
+        large_font = self.text_cache.sys_font('Arial', 50)  # Font for Game Over message
+        small_font = self.text_cache.sys_font('Arial', 30)  # Font for Restart message
+
+        # Render text
+        game_over_msg = self.text_cache.render(large_font, "GAME OVER", RED)
+        restart_msg = self.text_cache.render(small_font, "Press R to Restart", WHITE)
+
+        # Center text on the screen
+        game_over_x = WIN_W // 2 - game_over_msg.get_width() // 2
+        game_over_y = WIN_H // 2 - game_over_msg.get_height() - 20
+        restart_x = WIN_W // 2 - restart_msg.get_width() // 2
+        restart_y = WIN_H // 2 + 20
+
+        # Draw text on screen
+        return [self.app.screen.blit(game_over_msg, (game_over_x, game_over_y)),
+                self.app.screen.blit(restart_msg, (restart_x, restart_y))]
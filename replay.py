@@ -0,0 +1,119 @@
+from settings import *  # Import all configuration settings
+from tetris import Tetris  # Import headless Tetris game logic
+from pieces import PIECE_SOURCES  # Import the seeded piece sources
+import sys  # System-specific parameters and functions
+import time  # For timing the headless re-simulation
+
+REPLAY_MAGIC = b'TRP2'  # File signature and format version
+SOURCE_NAMES = list(PIECE_SOURCES)  # Piece sources in replay files, stored by index
+END_CODE = 0x7F  # Action code marking the last tick of the replay, kept clear of new actions
+
+
+def write_varint(out, value):
+    """Append an unsigned integer as a LEB128 varint."""
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """Read a LEB128 varint starting at pos, returning (value, next position)."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class Recorder:
+    """Records the actions applied to a game as a compact (tick delta, action) varint stream."""
+    def __init__(self, tetris):
+        self.tetris = tetris  # Game being recorded
+        self.data = bytearray(REPLAY_MAGIC)  # Encoded replay
+        self.data.append(SOURCE_NAMES.index(tetris.pieces.name))
+        write_varint(self.data, tetris.seed)
+        self.last_tick = tetris.ticks  # Tick of the last recorded event
+
+    def step(self, actions=()):
+        """Record the actions, then advance the game by one tick with them."""
+        tick = self.tetris.ticks + 1  # Tick the actions are applied on
+        for action in actions:
+            write_varint(self.data, tick - self.last_tick)
+            self.data.append(ACTIONS.index(action))
+            self.last_tick = tick
+        self.tetris.step(actions)
+
+    def finish(self):
+        """Close the stream with the final tick and return the replay bytes."""
+        data = bytearray(self.data)
+        write_varint(data, self.tetris.ticks - self.last_tick)
+        data.append(END_CODE)
+        return bytes(data)
+
+    def save(self, path):
+        """Write the finished replay to a file."""
+        with open(path, 'wb') as file:
+            file.write(self.finish())
+
+
+class Player:
+    """Feeds the actions of a recorded game back tick by tick."""
+    def __init__(self, data):
+        if data[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+            raise ValueError('not a Tetris replay')
+        pos = len(REPLAY_MAGIC)
+        self.piece_source = SOURCE_NAMES[data[pos]]  # Piece source the game was played with
+        self.seed, pos = read_varint(data, pos + 1)  # Seed the game was played with
+
+        self.events = {}  # Tick -> actions applied on that tick
+        tick = 0
+        while True:
+            delta, pos = read_varint(data, pos)
+            code = data[pos]
+            pos += 1
+            tick += delta
+            if code == END_CODE:
+                break
+            self.events.setdefault(tick, []).append(ACTIONS[code])
+        self.last_tick = tick  # Number of ticks in the recorded game
+
+    @classmethod
+    def load(cls, path):
+        """Read a replay file."""
+        with open(path, 'rb') as file:
+            return cls(file.read())
+
+    def new_game(self):
+        """Create a game with the recorded seed and piece source."""
+        return Tetris(self.seed, self.piece_source)
+
+    def actions_for(self, tick):
+        """Return the actions applied on the given tick."""
+        return self.events.get(tick, ())
+
+    def done(self, tetris):
+        """Check if the game has reached the end of the recording."""
+        return tetris.ticks >= self.last_tick
+
+    def play(self):
+        """Re-simulate the whole game headless as fast as possible and return it."""
+        tetris = self.new_game()
+        events, step = self.events, tetris.step
+        for tick in range(1, self.last_tick + 1):
+            step(events.get(tick, ()))
+        return tetris
+
+
+# Re-simulate replay files headless and print their results
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        player = Player.load(path)
+        tetris = player.play()
+        elapsed = time.perf_counter() - start
+        print(f'{path}: seed={player.seed} source={player.piece_source} ticks={tetris.ticks} '
+              f'score={tetris.score} game_over={tetris.game_over} ({elapsed * 1000:.1f} ms)')
@@ -0,0 +1,289 @@
+from settings import *  # Import all configuration settings
+from tetromino import ROTATIONS, KICKS, SPAWN_POSITIONS  # Import the precomputed rotation and kick tables
+from collections import OrderedDict, deque  # LRU cache of searches and BFS queue
+from operator import sub  # Fast pairwise differences of column heights
+
+
+def build_symmetry_table():
+    """Map every orientation to the first orientation covering the same cells, as (orientation, dx, dy) shifts."""
+    table = {}
+    for shape, orientations in ROTATIONS.items():
+        table[shape] = []
+        for cells, *_ in orientations:
+            for o, (other, *_) in enumerate(orientations):
+                dx = min(x for x, y in cells) - min(x for x, y in other)  # Align the bounding boxes
+                dy = min(y for x, y in cells) - min(y for x, y in other)
+                if sorted((x - dx, y - dy) for x, y in cells) == sorted(other):
+                    table[shape].append((o, dx, dy))  # Pivot (x, y) here covers the cells of o at (x + dx, y + dy)
+                    break
+    return table
+
+
+SYMMETRIES = build_symmetry_table()  # Shape -> orientation -> (first orientation with the same cells, dx, dy)
+TOP_ROWS = 4  # Rows above the field covered by the free row masks of PlacementSearch.free_rows
+
+
+class Placement:
+    """A reachable final position of a Tetromino, with the moves that lead there from its start."""
+    __slots__ = ('shape', 'x', 'y', 'orientation', 'path', 'cells', 'lines', 'score')  # Many are cached at once
+
+    def __init__(self, shape, x, y, orientation, path):
+        self.shape = shape  # Shape of the placed Tetromino
+        self.x, self.y = x, y  # Pivot position where the Tetromino locks
+        self.orientation = orientation  # Orientation it locks in
+        self.path = path  # Moves from the start: 'left', 'right', 'rotate' and 'down' (one row)
+        self.cells = tuple((x + dx, y + dy) for dx, dy in ROTATIONS[shape][orientation][0])  # Locked cells
+        self.lines = 0  # Lines this placement clears
+        self.score = 0  # Heuristic score, higher is better
+
+    def copy(self):
+        """Return a copy to score, sharing the path and cells."""
+        placement = Placement.__new__(Placement)
+        placement.shape, placement.x, placement.y, placement.orientation = self.shape, self.x, self.y, self.orientation
+        placement.path, placement.cells, placement.lines, placement.score = self.path, self.cells, self.lines, self.score
+        return placement
+
+    def __repr__(self):
+        return f'Placement({self.shape} x={self.x} y={self.y} o={self.orientation} score={self.score:.2f})'
+
+
+class Surface:
+    """Column heights and hole count of a board: everything board_features() reads, without copying a Field."""
+    __slots__ = ('heights', 'holes')
+
+    def __init__(self, heights, holes):
+        self.heights = heights  # Height of the highest block of every column
+        self.holes = holes  # Number of empty cells with a block somewhere above them
+
+
+def board_features(field):
+    """Return (aggregate height, holes, bumpiness) of a field or Surface, read from its incremental column index."""
+    heights = field.heights
+    bumpiness = sum(map(abs, map(sub, heights, heights[1:])))
+    return sum(heights), field.holes, bumpiness
+
+
+class Heuristic:
+    """Linear placement score over aggregate height, holes, bumpiness and cleared lines."""
+    def __init__(self, height=-0.51, holes=-0.36, bumpiness=-0.18, lines=0.76):
+        self.weights = (height, holes, bumpiness, lines)  # Weight of each feature
+
+    def __call__(self, field, lines):
+        """Score the board (Field or Surface) left after a placement that cleared the given number of lines."""
+        height, holes, bumpiness = board_features(field)
+        w_height, w_holes, w_bumpiness, w_lines = self.weights
+        return w_height * height + w_holes * holes + w_bumpiness * bumpiness + w_lines * lines
+
+
+def path_to_actions(path):
+    """Turn a placement path into per-tick action lists for Tetris.step, ending with the ticks that lock it."""
+    ticks, pending = [], []
+    for move in path:
+        if move == 'down':
+            ticks.append(pending + ['down'])  # Moves apply before the row's fall, whichever tick it is on
+            ticks += [[] for _ in range(FAST_ANIM_TICKS - 1)]  # Any FAST_ANIM_TICKS ticks in a row contain one fall
+            pending = []
+        else:
+            pending.append(move)
+    ticks.append(pending + ['down'])  # The last blocked fall locks the Tetromino
+    ticks += [[] for _ in range(FAST_ANIM_TICKS - 1)]
+    return ticks
+
+
+class PlacementSearch:
+    """Enumerates every reachable lock position by BFS over (x, y, orientation) and ranks them."""
+    def __init__(self, heuristic=None, lookahead=True, cache_size=SEARCH_CACHE_SIZE,
+                 lookahead_width=SEARCH_LOOKAHEAD_WIDTH):
+        self.heuristic = heuristic or Heuristic()  # Callable (Field or Surface, lines) -> score
+        self.lookahead = lookahead  # Also place the next Tetromino when ranking
+        self.lookahead_width = lookahead_width  # Number of best placements ranked again with the next Tetromino
+        self.cache_size = cache_size  # Maximum number of remembered searches
+        self.cache = OrderedDict()  # (rows, shape, x, y, orientation) -> placements, least recently used first
+        self.ranked = OrderedDict()  # (rows, shape, start, next shape, heuristic, width) -> ranking, least recent first
+
+    def remember(self, cache, key, value):
+        """Store a result in an LRU cache, evicting the least recently used one when it is full."""
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return value
+
+    def placements(self, field, shape, x, y, orientation):
+        """Return every distinct placement reachable from the given start, using the Tetromino collision rules."""
+        key = (tuple(field.rows), shape, x, y, orientation)
+        if key in self.cache:
+            self.cache.move_to_end(key)  # Mark as most recently used
+            return self.cache[key]
+        return self.remember(self.cache, key, self.bfs(field, shape, x, y, orientation))
+
+    def free_rows(self, field, shape):
+        """Return (orientation, x) -> bitmask of the pivot rows where the Tetromino fits; bit y + TOP_ROWS is row y."""
+        height, columns, top = field.height, field.columns, TOP_ROWS
+        free = {}
+        for o, (cells, row_masks, min_x, max_x, bottoms) in enumerate(ROTATIONS[shape]):
+            in_field = (1 << (height - max(dy for dx, dy in cells) + top)) - 1  # Pivot rows above the floor
+            for px in range(-min_x, field.width - max_x):
+                blocked = 0
+                for dx, dy in cells:
+                    hits = columns[px + dx] << top  # Field rows where this block would overlap a block
+                    blocked |= hits >> dy if dy >= 0 else hits << -dy  # Field row r blocks pivot row r - dy
+                free[(o, px)] = in_field & ~blocked
+        return free
+
+    def bfs(self, field, shape, x, y, orientation):
+        """Breadth-first search from the start state; shortest move paths come first."""
+        rotations, kicks, collide = ROTATIONS[shape], KICKS[shape], field.is_collide_masks
+        free, top = self.free_rows(field, shape), TOP_ROWS
+
+        def fits(x, y, o):
+            if y < -top:  # Higher than the free row masks reach
+                return not collide(rotations[o][1], rotations[o][2], rotations[o][3], x, y)
+            return free.get((o, x), 0) >> (y + top) & 1
+        if not fits(x, y, orientation):
+            return []  # The Tetromino is already blocked
+
+        parents = {(x, y, orientation): None}  # State -> (previous state, move)
+        queue = deque([(x, y, orientation)])
+        placements, seen_cells = [], set()
+        while queue:
+            state = queue.popleft()
+            x, y, o = state
+            moves = [('left', x - 1, y, o), ('right', x + 1, y, o), ('down', x, y + 1, o)]
+            rotated = (o + 1) % 4
+            for kick_x, kick_y in kicks[o]:
+                if fits(x + kick_x, y + kick_y, rotated):
+                    moves.append(('rotate', x + kick_x, y + kick_y, rotated))  # First free kick, like Tetromino.rotate
+                    break
+
+            for move, nx, ny, no in moves:
+                if move == 'down' and not fits(nx, ny, no):
+                    placement = Placement(shape, x, y, o, self.get_path(parents, state))  # Falling is blocked: it locks here
+                    cells = tuple(sorted(placement.cells))
+                    if cells not in seen_cells:  # Symmetric orientations give the same cells
+                        seen_cells.add(cells)
+                        placements.append(placement)
+                elif (nx, ny, no) not in parents and (move == 'rotate' or fits(nx, ny, no)):
+                    parents[(nx, ny, no)] = (state, move)
+                    queue.append((nx, ny, no))
+        return placements
+
+    def lock_positions(self, field, shape, x, y, orientation):
+        """Return every reachable (x, y, orientation) lock position, without paths, by flood-filling row bitmasks."""
+        kicks, top = KICKS[shape], TOP_ROWS
+        free = self.free_rows(field, shape)  # (orientation, x) -> bitmask of the pivot rows where the Tetromino fits
+
+        reached = dict.fromkeys(free, 0)  # (orientation, x) -> bitmask of the reachable pivot rows
+        start = (orientation, x)
+        if not free.get(start, 0) >> (y + top) & 1:
+            return []  # The Tetromino is already blocked
+        reached[start] = 1 << (y + top)
+        changed = [start]
+        while changed:
+            o, px = changed.pop()
+            rows, column = reached[(o, px)], free[(o, px)]
+            rows |= ((column + rows) ^ column) & column  # Fall through each free run: the carry clears it downwards
+            reached[(o, px)] = rows
+
+            targets = []  # (state, rows reached there) by one more move
+            for side in (px - 1, px + 1):
+                if (o, side) in free:
+                    targets.append(((o, side), rows & free[(o, side)]))
+            rotated, remaining = (o + 1) % 4, rows
+            for kick_x, kick_y in kicks[o]:  # First free kick wins, like Tetromino.rotate
+                target = free.get((rotated, px + kick_x), 0)
+                target = target << -kick_y if kick_y < 0 else target >> kick_y  # Align with the rows before the kick
+                kicked = remaining & target
+                remaining &= ~kicked
+                if kicked:
+                    kicked = kicked << kick_y if kick_y > 0 else kicked >> -kick_y
+                    targets.append(((rotated, px + kick_x), kicked))
+
+            for state, new in targets:
+                if new & ~reached[state]:
+                    reached[state] |= new
+                    changed.append(state)
+
+        locks = set()  # Symmetric orientations are stored once, under the first orientation covering the cells
+        symmetries = SYMMETRIES[shape]
+        for (o, px), rows in reached.items():
+            rows &= ~(free[(o, px)] >> 1)  # Falling one more row is blocked
+            same, dx, dy = symmetries[o]
+            while rows:
+                low = rows & -rows
+                locks.add((px + dx, low.bit_length() - 1 - top + dy, same))
+                rows ^= low
+        return list(locks)
+
+    def get_path(self, parents, state):
+        """Rebuild the moves leading to a state."""
+        path = []
+        while parents[state]:
+            state, move = parents[state]
+            path.append(move)
+        return tuple(reversed(path))
+
+    def apply(self, field, cells):
+        """Return a copy of the field with the cells locked and full lines cleared, plus the lines cleared."""
+        field = field.copy()
+        field.place(cells, 0)
+        return field, len(field.clear_full_lines())
+
+    def outcome(self, field, cells):
+        """Return the Surface left by locking the cells, and the lines they clear, copying the field only to clear lines."""
+        rows, full, height = field.rows, field.full_mask, field.height
+        heights, filled = field.heights[:], field.filled
+        added = {}  # Row -> bits the cells add to it
+        for x, y in cells:
+            if y >= 0:  # Cells above the field are not kept, like Field.place
+                added[y] = added.get(y, 0) | 1 << x
+                if height - y > heights[x]:
+                    heights[x] = height - y
+        for y, bits in added.items():
+            row = rows[y]
+            if row | bits == full:
+                after, lines = self.apply(field, cells)
+                return Surface(after.heights, after.holes), lines
+            filled += (bits & ~row).bit_count()
+        return Surface(heights, sum(heights) - filled), 0
+
+    def rank(self, field, shape, start, next_shape=None):
+        """Score every placement of shape from start (x, y, orientation), best first.
+
+        With a next shape, the best lookahead_width placements are ranked again by the best board
+        reachable after also placing the next Tetromino, and stay ahead of the others.
+        """
+        key = (tuple(field.rows), shape, start, next_shape, self.heuristic, self.lookahead_width)
+        if key in self.ranked:
+            self.ranked.move_to_end(key)  # Mark as most recently used
+            return list(self.ranked[key])
+
+        placements = [placement.copy() for placement in self.placements(field, shape, *start)]  # Cache stays unscored
+        for placement in placements:
+            surface, placement.lines = self.outcome(field, placement.cells)
+            placement.score = self.heuristic(surface, placement.lines)
+        placements.sort(key=lambda placement: placement.score, reverse=True)
+        if next_shape is not None:
+            best = placements[:self.lookahead_width]
+            spawn_x, spawn_y = SPAWN_POSITIONS[next_shape]
+            rotations = ROTATIONS[next_shape]
+            for placement in best:
+                after, score = self.apply(field, placement.cells)[0], float('-inf')  # -inf when the next cannot spawn
+                for x, y, o in self.lock_positions(after, next_shape, spawn_x, spawn_y, 0):
+                    surface, lines = self.outcome(after, [(x + dx, y + dy) for dx, dy in rotations[o][0]])
+                    score = max(score, self.heuristic(surface, placement.lines + lines))
+                placement.score = score
+            best.sort(key=lambda placement: placement.score, reverse=True)
+            placements[:len(best)] = best
+        return list(self.remember(self.ranked, key, placements))
+
+    def search(self, tetris):
+        """Rank every placement of the current Tetromino of a game, looking at the next one if enabled."""
+        tetromino = tetris.tetromino
+        next_shape = tetris.next_tetromino.shape if self.lookahead else None
+        return self.rank(tetris.field, tetromino.shape,
+                         (tetromino.x, tetromino.y, tetromino.orientation), next_shape)
+
+    def best(self, tetris):
+        """Return the best placement for the current Tetromino, or None when it has no move."""
+        placements = self.search(tetris)
+        return placements[0] if placements else None
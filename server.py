@@ -0,0 +1,375 @@
+from settings import *  # Import all configuration settings
+from tetris import Tetris  # Import headless Tetris game logic
+from pieces import SHAPES  # Shape order used to send shapes as one byte
+from replay import write_varint, read_varint, SOURCE_NAMES  # Varints and piece source indices, as in replays
+from instrument import get_logger  # Leveled, rate-limited logging
+import argparse  # For command-line options
+import logging  # For setting the log level from the command line
+import asyncio  # One event loop serves every session
+import random  # For the load test inputs
+import time  # For the load test duration
+
+log = get_logger('server')
+
+# Every message is a frame: 2-byte little-endian payload length, then the payload starting with its type
+JOIN = 0x01  # Client -> server: seed varint (0 for a random seed, else seed + 1), piece source index byte
+INPUT = 0x02  # Client -> server: action codes (indices into ACTIONS) applied on the next tick
+WELCOME = 0x10  # Server -> client: seed varint, piece source index byte; a full STATE follows
+STATE = 0x11  # Server -> client: tick varint, flags byte, then the parts named by the flags, in flag order
+
+# STATE flags: which parts of the game changed since the last STATE sent to the client
+PIECE = 0x01  # Current Tetromino: shape, colour, zigzag x, zigzag y, orientation
+NEXT = 0x02  # Next Tetromino: shape, colour
+SCORE = 0x04  # Score and total lines varints
+STATUS = 0x08  # Byte with bit 0 paused, bit 1 game over
+ROWS = 0x10  # Count varint, then per row: y varint, mask varint, colour byte of every set cell from x = 0
+
+SHAPE_INDEX = {shape: i for i, shape in enumerate(SHAPES)}  # Shape name -> byte sent on the wire
+MAX_FRAME = 0xFFFF  # Longest payload the 2-byte length prefix can carry
+
+
+def zigzag(value):
+    """Map a signed integer to an unsigned one for varint encoding (0, -1, 1, -2 -> 0, 1, 2, 3)."""
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    """Inverse of zigzag."""
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def varint_size(value):
+    """Bytes of an unsigned integer written as a varint."""
+    return max(1, (value.bit_length() + 6) // 7)
+
+
+def max_state_size(width, height):
+    """Bytes of the largest STATE a game on a field of this size can produce: every part and every row."""
+    number = 10  # Varint of a 64-bit tick, score or line count
+    piece = 3 + 2 * varint_size(zigzag(-(width + height)))  # Shape, colour, orientation and the x, y varints
+    row = varint_size(height) + varint_size((1 << width) - 1) + width  # y, mask and a colour for every cell
+    return 2 + number + piece + 2 + 2 * number + 1 + varint_size(height) + height * row
+
+
+def frame(payload):
+    """Prefix a message with its length."""
+    return len(payload).to_bytes(2, 'little') + payload
+
+
+async def read_frame(reader):
+    """Read one message, raising asyncio.IncompleteReadError when the connection is closed."""
+    length = int.from_bytes(await reader.readexactly(2), 'little')
+    return await reader.readexactly(length)
+
+
+def row_cells(field, y):
+    """Mask and cell colours of a field row, as sent in STATE messages."""
+    mask, width, colors = field.rows[y], field.width, field.colors
+    return mask, bytes(colors[y * width + x] for x in range(width) if mask >> x & 1)
+
+
+class View:
+    """What a client was last sent of a game, so the next STATE only carries what changed."""
+    def __init__(self, height=FIELD_H):
+        self.piece = self.next = self.score = self.status = None  # Last sent parts
+        self.rows = [None] * height  # Last sent (mask, colours) of every row
+        self.field = None  # (field, version) the rows were last compared against
+
+    def encode(self, tetris):
+        """Return the STATE payload for what changed in the game since the last one, or None when nothing did."""
+        out = bytearray([STATE])
+        write_varint(out, tetris.ticks)
+        flags_at = len(out)
+        out.append(0)
+        flags = 0
+
+        tetromino = tetris.tetromino
+        piece = (SHAPE_INDEX[tetromino.shape], tetromino.color, tetromino.x, tetromino.y, tetromino.orientation)
+        if piece != self.piece:
+            flags |= PIECE
+            out += bytes(piece[:2])
+            write_varint(out, zigzag(piece[2]))
+            write_varint(out, zigzag(piece[3]))
+            out.append(piece[4])
+            self.piece = piece
+        next_piece = (SHAPE_INDEX[tetris.next_tetromino.shape], tetris.next_tetromino.color)
+        if next_piece != self.next:
+            flags |= NEXT
+            out += bytes(next_piece)
+            self.next = next_piece
+        score = (tetris.score, tetris.lines)
+        if score != self.score:
+            flags |= SCORE
+            write_varint(out, score[0])
+            write_varint(out, score[1])
+            self.score = score
+        status = tetris.paused | tetris.game_over << 1
+        if status != self.status:
+            flags |= STATUS
+            out.append(status)
+            self.status = status
+
+        field = tetris.field
+        if (field, field.version) != self.field:  # Rows are only compared after the field changed
+            self.field = (field, field.version)
+            changed = []
+            for y in range(field.height):
+                cells = row_cells(field, y)
+                if cells != self.rows[y]:
+                    changed.append((y, cells))
+                    self.rows[y] = cells
+            if changed:
+                flags |= ROWS
+                write_varint(out, len(changed))
+                for y, (mask, colors) in changed:
+                    write_varint(out, y)
+                    write_varint(out, mask)
+                    out += colors
+
+        if not flags:
+            return None
+        out[flags_at] = flags
+        return bytes(out)
+
+
+class ClientState:
+    """A client's copy of a game, rebuilt from the server's WELCOME and STATE messages."""
+    def __init__(self, width=FIELD_W, height=FIELD_H):
+        self.width, self.height = width, height  # Field size
+        self.seed = self.piece_source = None  # Game identity from WELCOME
+        self.ticks = 0  # Tick of the last STATE
+        self.rows = [0] * height  # Row bitmasks, like Field.rows
+        self.colors = bytearray(width * height)  # Tile colour of every occupied cell, row-major
+        self.piece = None  # Current Tetromino as (shape, colour, x, y, orientation)
+        self.next = None  # Next Tetromino as (shape, colour)
+        self.score = self.lines = 0  # Score and total lines cleared
+        self.paused = self.game_over = False  # Game status
+
+    def apply(self, payload):
+        """Update the state from a WELCOME or STATE message."""
+        if payload[0] == WELCOME:
+            self.__init__(self.width, self.height)  # A new game starts
+            self.seed, pos = read_varint(payload, 1)
+            self.piece_source = SOURCE_NAMES[payload[pos]]
+            return
+
+        self.ticks, pos = read_varint(payload, 1)
+        flags = payload[pos]
+        pos += 1
+        if flags & PIECE:
+            shape, color = SHAPES[payload[pos]], payload[pos + 1]
+            x, pos = read_varint(payload, pos + 2)
+            y, pos = read_varint(payload, pos)
+            self.piece = (shape, color, unzigzag(x), unzigzag(y), payload[pos])
+            pos += 1
+        if flags & NEXT:
+            self.next = (SHAPES[payload[pos]], payload[pos + 1])
+            pos += 2
+        if flags & SCORE:
+            self.score, pos = read_varint(payload, pos)
+            self.lines, pos = read_varint(payload, pos)
+        if flags & STATUS:
+            self.paused, self.game_over = bool(payload[pos] & 1), bool(payload[pos] & 2)
+            pos += 1
+        if flags & ROWS:
+            count, pos = read_varint(payload, pos)
+            for _ in range(count):
+                y, pos = read_varint(payload, pos)
+                mask, pos = read_varint(payload, pos)
+                self.rows[y] = mask
+                for x in range(self.width):
+                    if mask >> x & 1:
+                        self.colors[y * self.width + x] = payload[pos]
+                        pos += 1
+
+
+class Session:
+    """One connected player and their game."""
+    def __init__(self, writer, seed, piece_source):
+        self.writer = writer  # Stream the STATE messages go to
+        self.tetris = Tetris(seed, piece_source)  # The player's game
+        width, height = self.tetris.field.width, self.tetris.field.height
+        if max_state_size(width, height) > MAX_FRAME:
+            raise ValueError(f'a {width}x{height} field does not fit in one STATE frame')
+        self.view = View(self.tetris.field.height)  # What the player was last sent
+        self.actions = []  # Actions received for the next tick
+
+    def send(self, payload):
+        """Queue a message to the player without waiting for it to be sent."""
+        self.writer.write(frame(payload))
+
+    def welcome(self):
+        """Send the game identity and its full state."""
+        out = bytearray([WELCOME])
+        write_varint(out, self.tetris.seed)
+        out.append(SOURCE_NAMES.index(self.tetris.pieces.name))
+        self.send(bytes(out))
+        self.send(self.view.encode(self.tetris))
+
+    def queue(self, codes):
+        """Queue action codes for the next tick; input after Game Over or beyond SERVER_MAX_ACTIONS is dropped."""
+        if not self.tetris.game_over:
+            room = SERVER_MAX_ACTIONS - len(self.actions)
+            self.actions += [ACTIONS[code] for code in codes if code < len(ACTIONS)][:max(room, 0)]
+
+    def tick(self):
+        """Advance the game by one tick with the received actions and send what changed."""
+        if not self.tetris.game_over:
+            self.tetris.step(self.actions)
+            self.actions = []
+            state = self.view.encode(self.tetris)
+            if state:
+                self.send(state)
+
+
+class GameServer:
+    """Hosts many independent games on one asyncio loop, all advanced by one shared tick timer."""
+    def __init__(self, tick_rate=TICK_RATE):
+        self.interval = 1 / tick_rate  # Seconds between ticks
+        self.sessions = {}  # Writer -> Session of every player in a game
+        self.ticks = 0  # Ticks run by the shared timer
+
+    async def handle(self, reader, writer):
+        """Serve one connection: JOIN starts (or restarts) a game, INPUT queues actions for the next tick."""
+        try:
+            while True:
+                payload = await read_frame(reader)
+                if payload[:1] == bytes([JOIN]):
+                    seed, pos = read_varint(payload, 1)
+                    piece_source = SOURCE_NAMES[payload[pos]]
+                    session = Session(writer, seed - 1 if seed else None, piece_source)
+                    self.sessions[writer] = session
+                    session.welcome()
+                elif payload[:1] == bytes([INPUT]) and writer in self.sessions:
+                    self.sessions[writer].queue(payload[1:])
+                else:
+                    raise ValueError(f'unexpected message {payload[:1].hex()}')
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # The player left
+        except (ValueError, IndexError) as error:
+            log.warning('Dropping client: %s', error)
+        finally:
+            self.sessions.pop(writer, None)
+            writer.close()
+
+    def tick(self):
+        """Advance every game by one tick, dropping players who do not read their messages."""
+        self.ticks += 1
+        for writer, session in list(self.sessions.items()):
+            session.tick()
+            if writer.transport.get_write_buffer_size() > SERVER_WRITE_LIMIT:
+                log.warning('Dropping client that stopped reading')
+                del self.sessions[writer]
+                writer.close()
+
+    async def run_ticks(self):
+        """Run the shared tick timer, catching up on late ticks up to MAX_FRAME_TIME."""
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            next_time += self.interval
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > MAX_FRAME_TIME / 1000:
+                log.warning('Tick timer %.0f ms behind with %d sessions, skipping ahead', -delay * 1000,
+                            len(self.sessions))
+                next_time = loop.time()
+            self.tick()
+
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """Accept players on a TCP port, or on a Unix socket when a path is given, until cancelled."""
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        log.info('Serving on %s', path or f'{host}:{port}')
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run_ticks())
+
+
+class Client:
+    """Local client: joins a game on the server, sends actions and keeps a ClientState up to date."""
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer  # Connection to the server
+        self.state = ClientState()  # The game as rebuilt from the server's messages
+        self.received = 0  # Bytes received, frame headers included
+
+    @classmethod
+    async def connect(cls, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """Open a connection to a server on a TCP port, or on a Unix socket when a path is given."""
+        if path:
+            return cls(*await asyncio.open_unix_connection(path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    def join(self, seed=None, piece_source=PIECE_SOURCE):
+        """Ask for a new game."""
+        out = bytearray([JOIN])
+        write_varint(out, 0 if seed is None else seed + 1)
+        out.append(SOURCE_NAMES.index(piece_source))
+        self.writer.write(frame(bytes(out)))
+
+    def send(self, actions):
+        """Send actions to be applied on the server's next tick."""
+        self.writer.write(frame(bytes([INPUT] + [ACTIONS.index(action) for action in actions])))
+
+    async def receive(self):
+        """Wait for the next message and apply it to the state."""
+        payload = await read_frame(self.reader)
+        self.received += len(payload) + 2
+        self.state.apply(payload)
+        return payload
+
+    async def close(self):
+        """Leave the server."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def load_test(count, seconds, host, port, path):
+    """Play count random-input clients against a server for some seconds and report the traffic they got."""
+    async def play(seed):
+        client = await Client.connect(host, port, path)
+        client.join(seed)
+        rng = random.Random(seed)
+        end, messages = time.monotonic() + seconds, 0
+        while time.monotonic() < end:
+            if rng.random() < 0.1:
+                client.send([rng.choice(('left', 'right', 'rotate', 'drop'))])
+            try:
+                await asyncio.wait_for(client.receive(), end - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            messages += 1
+            if client.state.game_over:
+                client.join(seed)  # Play again
+        await client.close()
+        return messages, client.received, client.state.ticks
+
+    results = await asyncio.gather(*(play(seed) for seed in range(count)))
+    messages = sum(result[0] for result in results)
+    received = sum(result[1] for result in results)
+    print(f'{count} clients, {seconds} s: {messages / count / seconds:.1f} messages/s and '
+          f'{received / count / seconds:.0f} bytes/s per client, last tick {max(result[2] for result in results)}')
+
+
+# Run the game server or a local load test against it
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless Tetris game server hosting many sessions on one loop.')
+    parser.add_argument('mode', choices=('serve', 'clients'), help='serve: run the server; clients: load test it')
+    parser.add_argument('--host', default=SERVER_HOST, help='TCP host to serve on or connect to')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='TCP port to serve on or connect to')
+    parser.add_argument('--unix', help='Unix socket path, used instead of TCP')
+    parser.add_argument('--count', type=int, default=100, help='clients: number of clients')
+    parser.add_argument('--seconds', type=float, default=10, help='clients: load test duration')
+    parser.add_argument('--log-level', default=LOG_LEVEL, help='DEBUG, INFO, WARNING or ERROR')
+    args = parser.parse_args()
+    logging.getLogger('tetris').setLevel(args.log_level.upper())
+
+    try:
+        if args.mode == 'serve':
+            asyncio.run(GameServer().serve(args.host, args.port, args.unix))
+        else:
+            asyncio.run(load_test(args.count, args.seconds, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
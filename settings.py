@@ -1,31 +1,76 @@
-import pygame as pg
-
-
-vec = pg.math.Vector2  # 2D vector class used for position calculations
-
-
 # Frame Rate Setting
-FPS = 60  # Frames per second, controls the update speed of the game
+FPS = 60  # Highest frame rate; frames are only drawn when something on screen changed
+
+# Simulation Tick Settings
+TICK_RATE = 60  # Logical simulation ticks per second of game time
+TICK_TIME_INTERVAL = 1000 / TICK_RATE  # Game time covered by one tick (in milliseconds)
+MAX_FRAME_TIME = 250  # Longest frame the renderer catches up on, avoids a spiral of catch-up ticks (in milliseconds)
 
 # Color Definitions (RGB format)
 FIELD_COLOR = (48, 39, 32)  # Background color for the game field
 RED = (255, 0, 0)  # Red color for 'Game Over' text
 WHITE = (255, 255, 255)  # White color for regular text
 YELLOW = (255, 255, 0)  # Yellow color for pause text
+GREEN = (0, 200, 0)  # Green color for frames within budget in the frame stats graph
 BLACK = (0, 0, 0)  # Black color for drawing grid lines
+GHOST_ALPHA = 70  # Transparency of the ghost piece showing where the Tetromino will land
+SFX_ALPHA = 110  # Transparency of the blocks playing the line clear effect
+SFX_ANGLE_STEPS = 72  # Number of pre-rotated frames per tile image for the line clear effect (5 degree steps)
 
 
 PAUSE_TEXT = "Press P to Pause"  # Text displayed when the game is paused
 GAME_OVER_TEXT = "GAME OVER Press R to Restart"  # Text displayed when the game is over
 
 
+# Text Rendering Settings
+TEXT_CACHE_SIZE = 64  # Number of rendered text surfaces kept in the LRU cache
+PALETTE_SIZE = 360  # Number of precomputed colours in one cycle of the title colour animation
+PALETTE_CYCLE_TIME = 62832  # Length of one colour animation cycle, 20 * pi seconds (in milliseconds)
+IDLE_WAKE_TIME = PALETTE_CYCLE_TIME // PALETTE_SIZE  # Sleep while paused or over: one title colour step (in milliseconds)
+
+
 # Asset Paths
 SPRITE_DIR_PATH = 'assets/tiles'  # Directory containing block images
+TILE_COUNT = 6  # Number of tile colours the game picks from (one image per colour in SPRITE_DIR_PATH)
+BG_PATH = 'assets/bg.png'  # Default background image (theme) drawn behind the field
 FONT_PATH = 'assets/font/PartyLET-plain.ttf'  # Path to custom font used for in-game text
+ASSET_CACHE_DIR = '.cache'  # Directory of the pre-scaled asset bundles, rebuilt whenever the sources change
+
+# Instrumentation and Logging
+STATS_FRAMES = 600  # Frames kept in the timing ring buffer (10 seconds at 60 FPS)
+STATS_PHASES = ('events', 'wait', 'update', 'draw')  # Timed parts of a frame, in main loop order
+STATS_COUNTERS = ('ticks', 'collisions', 'lines', 'blits', 'text_renders', 'layer_builds')  # Counted per frame
+STATS_REFRESH_FRAMES = 30  # Frames between refreshes of the overlay percentiles
+STATS_GRAPH_SIZE = (240, 60)  # Size of the overlay frame time graph (in pixels)
+STATS_PATH = None  # File the frame stats are exported to on exit, None to skip (see --stats)
+SLOW_FRAME_TIME = 50  # Frames whose work takes longer are logged as warnings (in milliseconds)
+LOG_LEVEL = 'WARNING'  # Lowest level of the messages logged (see --log-level)
+LOG_INTERVAL = 1.0  # Repeats of a log message within this many seconds are suppressed
+
+# Placement Search
+SEARCH_CACHE_SIZE = 256  # Number of (field, piece) searches and rankings each remembered by PlacementSearch
+SEARCH_LOOKAHEAD_WIDTH = 4  # Number of best placements re-ranked by also placing the next Tetromino
+
+
+# Piece Generation and Replays
+PIECE_SOURCE = 'random'  # How pieces are dealt: 'random' (independent draws) or 'bag' (shuffled 7-bag)
+REPLAY_DIR = 'replays'  # Directory where the replay of every finished game is written
+SAVE_PATH = 'saves/quicksave.tsn'  # Snapshot written by F5 and loaded by F9
+UNDO_DEPTH = 50  # Number of Tetromino locks that can be taken back with Backspace
+
+
+# Game Server
+SERVER_HOST = '127.0.0.1'  # Address the game server listens on (local clients only by default)
+SERVER_PORT = 7777  # TCP port of the game server
+SERVER_WRITE_LIMIT = 64 * 1024  # Clients with more unsent bytes than this are dropped (they stopped reading)
+SERVER_MAX_ACTIONS = 8  # Most actions a player can queue for one tick; further input is dropped
+
 
 # Falling Speed Timers (in milliseconds)
 ANIM_TIME_INTERVAL = 300  # Normal falling interval (slow descent)
 FAST_ANIM_TIME_INTERVAL = 20  # Fast falling interval (when player holds Down key)
+ANIM_TICKS = max(1, round(ANIM_TIME_INTERVAL / TICK_TIME_INTERVAL))  # Normal falling interval in ticks
+FAST_ANIM_TICKS = max(1, round(FAST_ANIM_TIME_INTERVAL / TICK_TIME_INTERVAL))  # Fast falling interval in ticks
 
 
 # Field and Tile Settings
@@ -39,18 +84,32 @@ FIELD_SCALE_W, FIELD_SCALE_H = 2.2, 1  # Scaling factors for window width and he
 WIN_RES = WIN_W, WIN_H = FIELD_RES[0] * FIELD_SCALE_W, FIELD_RES[1] * FIELD_SCALE_H  # Final game window size in pixels
 
 
-INIT_POS_OFFSET = vec(FIELD_W // 2, 1)  # Starting offset for new Tetromino (spawn point)
-NEXT_POS_OFFSET = vec(FIELD_W * 1.5, FIELD_H * 0.37)  # Position offset for 'Next Tetromino' preview
+INIT_POS_OFFSET = (FIELD_W // 2, 1)  # Starting offset for new Tetromino (spawn point)
+NEXT_POS_OFFSET = (FIELD_W * 1.5, FIELD_H * 0.37)  # Position offset for 'Next Tetromino' preview
 
 
 MOVE_DIRECTIONS = {
-    'left': vec(-1, 0),  # Move one block left
-    'right': vec(1, 0),  # Move one block right
-    'down': vec(0, 1)  # Move one block down
+    'left': (-1, 0),  # Move one block left
+    'right': (1, 0),  # Move one block right
+    'down': (0, 1)  # Move one block down
 }
 
+# Player Actions accepted by Tetris.step
+ACTIONS = (
+    'left',  # Move the Tetromino one block left
+    'right',  # Move the Tetromino one block right
+    'rotate',  # Rotate the Tetromino 90 degrees
+    'down',  # Switch to fast falling
+    'pause',  # Pause or resume the game
+    'drop'  # Hard drop: land the Tetromino at once
+)
+
+# Wall Kicks
+# Offsets tried in order when rotating; the first one that does not collide is used
+WALL_KICKS = [(0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0)]
+
 # Tetromino Shape Definitions
-# Each Tetromino is defined as a list of block positions relative to the pivot
+# Each Tetromino is defined as a list of block positions; the first block is the rotation pivot
 TETROMINOES = {
     'T': [(0, 1), (-1, 1), (1, 1), (0, 0)],  # T-shape
     'O': [(0, 1), (0, 0), (1, 1), (1, 0)],  # O-shape (square)
@@ -0,0 +1,111 @@
+from settings import *  # Import all configuration settings
+from tetris import Tetris  # Import headless Tetris game logic
+from pieces import SHAPES, PIECE_SOURCES  # Shape order and piece sources, stored by index
+import struct  # Fixed-layout binary state
+
+SNAPSHOT_MAGIC = b'TSN2'  # Signature and format version
+
+
+def mask_layout(bits, count):
+    """Struct format of count bitmasks and their packed byte size: native integers up to 64 bits (size 0), bytes beyond."""
+    size = (bits + 7) // 8
+    for code, native in zip('BHIQ', (1, 2, 4, 8)):
+        if size <= native:
+            return f'{count}{code}', 0
+    return f'{count * size}s', size
+
+
+def pack_masks(masks, size):
+    """Struct values of bitmasks: the masks themselves, or one little-endian bytes value for wide masks."""
+    return masks if not size else [b''.join(mask.to_bytes(size, 'little') for mask in masks)]
+
+
+def unpack_masks(values, size):
+    """Bitmasks from the struct values written by pack_masks()."""
+    if not size:
+        return list(values)
+    return [int.from_bytes(values[0][i:i + size], 'little') for i in range(0, len(values[0]), size)]
+
+
+ROW_FORMAT, ROW_BYTES = mask_layout(FIELD_W, FIELD_H)  # Row masks, sized for any field width
+COLUMN_FORMAT, COLUMN_BYTES = mask_layout(FIELD_H, FIELD_W)  # Column masks, sized for any field height
+ROW_VALUES = 1 if ROW_BYTES else FIELD_H  # Struct values holding the row masks
+COLUMN_VALUES = 1 if COLUMN_BYTES else FIELD_W  # Struct values holding the column masks
+SOURCE_NAMES = list(PIECE_SOURCES)  # Piece sources, stored by index
+SHAPE_INDEX = {shape: i for i, shape in enumerate(SHAPES)}  # Shape name -> stored byte
+LAYOUT = struct.Struct(
+    '<4s'  # Magic
+    'QBQ'  # Seed, piece source index, xorshift state
+    f'{len(SHAPES)}sB'  # Shapes left in the bag (indices, unused bytes zero) and their count
+    'IIIBB'  # Ticks, score, total lines, full_lines, flags
+    'BBhhBB'  # Current Tetromino: shape, colour, x, y, orientation, landing
+    'BBhhB'  # Next Tetromino: shape, colour, x, y, orientation
+    f'{ROW_FORMAT}{FIELD_W * FIELD_H}s'  # Field row masks and tile colours
+    f'{COLUMN_FORMAT}{FIELD_W}HI'  # Field column index: column masks, heights and filled cell count
+)
+SNAPSHOT_SIZE = LAYOUT.size  # Every snapshot for this field size has this many bytes
+
+# Flags byte
+SPEED_UP, PAUSED, INITIALIZED, GAME_OVER = 1, 2, 4, 8
+
+
+def snapshot(tetris):
+    """Pack the whole game state into SNAPSHOT_SIZE bytes."""
+    pieces, field = tetris.pieces, tetris.field
+    bag = [SHAPE_INDEX[shape] for shape in getattr(pieces, 'bag', ())]  # Only BagPieces has a bag
+    current, upcoming = tetris.tetromino, tetris.next_tetromino
+    flags = (tetris.speed_up * SPEED_UP | tetris.paused * PAUSED |
+             tetris.initialized * INITIALIZED | tetris.game_over * GAME_OVER)
+    return LAYOUT.pack(
+        SNAPSHOT_MAGIC, tetris.seed, SOURCE_NAMES.index(pieces.name), pieces.random.state,
+        bytes(bag), len(bag),
+        tetris.ticks, tetris.score, tetris.lines, tetris.full_lines, flags,
+        SHAPE_INDEX[current.shape], current.color, current.x, current.y, current.orientation, current.landing,
+        SHAPE_INDEX[upcoming.shape], upcoming.color, upcoming.x, upcoming.y, upcoming.orientation,
+        *pack_masks(field.rows, ROW_BYTES), bytes(field.colors),
+        *pack_masks(field.columns, COLUMN_BYTES), *field.heights, field.filled
+    )
+
+
+def restore(tetris, data):
+    """Put a game back into a snapshotted state, in place, so everything holding the game stays valid.
+
+    Renderers notice the new field version and rebuild their layers on the next frame only.
+    """
+    if len(data) != SNAPSHOT_SIZE or data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError('not a Tetris snapshot for this field size')
+    values = LAYOUT.unpack(data)
+    seed, source, state, bag, bag_size = values[1:6]
+    if tetris.pieces.name != SOURCE_NAMES[source]:
+        tetris.pieces = PIECE_SOURCES[SOURCE_NAMES[source]](seed)
+    tetris.seed = tetris.pieces.seed = seed
+    tetris.pieces.random.state = state
+    if hasattr(tetris.pieces, 'bag'):
+        tetris.pieces.bag = [SHAPES[i] for i in bag[:bag_size]]
+
+    tetris.ticks, tetris.score, tetris.lines, tetris.full_lines, flags = values[6:11]
+    tetris.speed_up, tetris.paused = bool(flags & SPEED_UP), bool(flags & PAUSED)
+    tetris.initialized, tetris.game_over = bool(flags & INITIALIZED), bool(flags & GAME_OVER)
+    tetris.cleared_rows = []  # No line clear effect for restored rows
+
+    current, upcoming = tetris.tetromino, tetris.next_tetromino
+    shape, current.color, current.x, current.y, current.orientation, landing = values[11:17]
+    current.shape, current.landing, current.current = SHAPES[shape], bool(landing), True
+    shape, upcoming.color, upcoming.x, upcoming.y, upcoming.orientation = values[17:22]
+    upcoming.shape, upcoming.landing, upcoming.current = SHAPES[shape], False, False
+
+    field, i = tetris.field, 22 + ROW_VALUES  # Index of the tile colours
+    field.rows = unpack_masks(values[22:i], ROW_BYTES)
+    field.colors = bytearray(values[i])
+    field.columns = unpack_masks(values[i + 1:i + 1 + COLUMN_VALUES], COLUMN_BYTES)
+    i += 1 + COLUMN_VALUES  # Index of the column heights
+    field.heights = list(values[i:i + FIELD_W])
+    field.filled = values[i + FIELD_W]
+    field.version += 1  # Lets renderers know the field changed
+
+
+def load(data):
+    """Create a new game from a snapshot."""
+    tetris = Tetris(seed=0)
+    restore(tetris, data)
+    return tetris
@@ -1,115 +1,104 @@
 from settings import *  # Import all game settings and constants
-import random  # Import random module for randomizing Tetromino shapes and effects
-
-class Block(pg.sprite.Sprite):
-    """A single square block that forms part of a Tetromino piece."""
-    def __init__(self, tetromino, pos):
-        self.tetromino = tetromino  # Reference to the parent Tetromino object
-        self.pos = vec(pos) + INIT_POS_OFFSET  # Initial position on the grid
-        self.next_pos = vec(pos) + NEXT_POS_OFFSET  # Position for the 'next piece' preview
-        self.alive = True  # Status to determine if block is active
-
-        super().__init__(tetromino.tetris.sprite_group)  # Add block to the sprite group
-        self.image = tetromino.image  # Visual appearance of the block
-        self.rect = self.image.get_rect()  # Rect object for positioning on screen
-
-        # Special effects for disappearing animation
-        self.sfx_image = self.image.copy()  # Create a faded version of the block for effects
-        self.sfx_image.set_alpha(110)  # Set transparency for effect image
-        self.sfx_speed = random.uniform(0.2, 0.6)  # Random speed for the disappearing effect
-        self.sfx_cycles = random.randrange(6, 8)  # Number of animation cycles
-        self.cycle_counter = 0  # Counter for tracking animation cycles
-
-    def sfx_end_time(self):
-        """Handle timing for the disappearing animation."""
-        if self.tetromino.tetris.app.anim_trigger:
-            self.cycle_counter += 1
-            if self.cycle_counter > self.sfx_cycles:
-                self.cycle_counter = 0
-                return True
-        return False
-
-    def sfx_run(self):
-        """Apply the fading and rotation animation."""
-        self.image = self.sfx_image  # Switch to the semi-transparent image
-        self.pos.y -= self.sfx_speed  # Move the block upwards slowly
-        self.image = pg.transform.rotate(self.image, pg.time.get_ticks() * self.sfx_speed)  # Rotate the block
-
-    def is_alive(self):
-        """Manage the block’s status: animate when dead, remove when finished."""
-        if not self.alive:
-            if not self.sfx_end_time():
-                self.sfx_run()
-            else:
-                self.kill()  # Remove the block from the game
-
-    def rotate(self, pivot_pos):
-        """Rotate the block 90 degrees around the pivot position."""
-        translated = self.pos - pivot_pos  # Move relative to pivot
-        rotated = translated.rotate(90)  # Rotate the position
-        return rotated + pivot_pos  # Move back to field coordinates
-
-    def set_rect_pos(self):
-        """Update the block’s rect position for drawing based on current or preview position."""
-        pos = [self.next_pos, self.pos][self.tetromino.current]
-        self.rect.topleft = pos * TILE_SIZE  # Update top-left corner position
 
-    def update(self):
-        """Update the block each frame: handle status and position."""
-        if self.alive:
-            self.is_alive()
-            self.set_rect_pos()
-
-    def is_collide(self, pos):
-        """Check if a block at the given position would collide with walls or other blocks."""
-        x, y = int(pos.x), int(pos.y)
-        if x < 0 or x >= FIELD_W or y >= FIELD_H:
-            return True  # Colliding with walls or bottom
-        if y >= 0 and self.tetromino.tetris.field_array[y][x]:
-            return True  # Colliding with existing block
-        return False
+
+def build_orientation(offsets):
+    """Describe one orientation as (cells, row_masks, min_x, max_x, bottoms) for table lookups and mask collision."""
+    min_x = min(dx for dx, dy in offsets)  # Leftmost column relative to the pivot
+    max_x = max(dx for dx, dy in offsets)  # Rightmost column relative to the pivot
+    masks = {}  # Row offset -> bitmask of the occupied columns, bit 0 being min_x
+    for dx, dy in offsets:
+        masks[dy] = masks.get(dy, 0) | 1 << (dx - min_x)
+    bottoms = {}  # Column offset -> row offset of the lowest block in that column
+    for dx, dy in offsets:
+        bottoms[dx] = max(bottoms.get(dx, dy), dy)
+    return tuple(offsets), tuple(sorted(masks.items())), min_x, max_x, tuple(sorted(bottoms.items()))
+
+
+def build_rotation_table():
+    """Precompute the four orientations of every shape as integer offsets from the pivot block."""
+    table = {}
+    for shape, positions in TETROMINOES.items():
+        px, py = positions[0]  # The first block is the rotation center
+        offsets = [(x - px, y - py) for x, y in positions]
+        orientations = []
+        for _ in range(4):
+            orientations.append(build_orientation(offsets))
+            offsets = [(-dy, dx) for dx, dy in offsets]  # Rotate 90 degrees: (dx, dy) -> (-dy, dx)
+        table[shape] = orientations
+    return table
+
+
+def build_kick_table():
+    """Precompute the wall kick candidates tried when rotating each shape out of each orientation."""
+    return {shape: [tuple(WALL_KICKS)] * 4 for shape in TETROMINOES}
+
+
+ROTATIONS = build_rotation_table()  # Shape -> 4 orientations of (cells, row_masks, min_x, max_x, bottoms)
+KICKS = build_kick_table()  # Shape -> orientation -> kick offsets to try when rotating
+SPAWN_POSITIONS = {shape: (positions[0][0] + INIT_POS_OFFSET[0], positions[0][1] + INIT_POS_OFFSET[1])
+                   for shape, positions in TETROMINOES.items()}  # Pivot position of a freshly spawned shape
+
 
 class Tetromino:
-    """Class representing a complete Tetromino composed of multiple Blocks."""
+    """Class representing a complete Tetromino as a pivot position plus an orientation of its shape."""
+    __slots__ = ('tetris', 'shape', 'color', 'orientation', 'x', 'y', 'landing', 'current')
+
     def __init__(self, tetris, current=True):
         self.tetris = tetris  # Reference to the Tetris game logic
-        self.shape = random.choice(list(TETROMINOES.keys()))  # Randomly select a shape
-        print(tetris.app.images) 
-        self.image = random.choice(tetris.app.images) if tetris.app.images else None  # Randomly select a block image
-        self.blocks = [Block(self, pos) for pos in TETROMINOES[self.shape]]  # Create the blocks based on the shape definition
+        self.reset(current)
+
+    def reset(self, current=True):
+        """Deal the next piece into this Tetromino at its spawn point, so landed Tetrominoes can be reused."""
+        self.shape, self.color = self.tetris.pieces.next_piece()  # Shape and tile colour index from the seeded piece source
+        self.orientation = 0  # Index into the shape's rotation table
+        self.x, self.y = SPAWN_POSITIONS[self.shape]  # Pivot block position on the field
         self.landing = False  # Flag indicating whether the Tetromino has landed
         self.current = current  # Is this the active (falling) Tetromino?
+        return self
 
-    def rotate(self):
-        """Attempt to rotate the Tetromino 90 degrees around the pivot block."""
-        pivot_pos = self.blocks[0].pos  # Use the first block as the rotation center
-        new_block_positions = [block.rotate(pivot_pos) for block in self.blocks]
-
-        if not self.is_collide(new_block_positions):
-            for i, block in enumerate(self.blocks):
-                block.pos = new_block_positions[i]  # Apply new rotated positions
+    @property
+    def blocks(self):
+        """Field positions of the Tetromino blocks."""
+        x, y = self.x, self.y
+        return [(x + dx, y + dy) for dx, dy in ROTATIONS[self.shape][self.orientation][0]]
 
-    def is_collide(self, block_positions):
-        """Check if the rotated or moved positions collide with walls or existing blocks."""
-        for block, new_pos in zip(self.blocks, block_positions):
-            if block.is_collide(new_pos):
-                return True
-        return False
+    def rotate(self):
+        """Attempt to rotate the Tetromino 90 degrees around the pivot block, trying the wall kicks in order."""
+        orientation = (self.orientation + 1) % 4
+        for kick_x, kick_y in KICKS[self.shape][self.orientation]:
+            if not self.is_collide(self.x + kick_x, self.y + kick_y, orientation):
+                self.x += kick_x
+                self.y += kick_y
+                self.orientation = orientation  # Apply the new orientation
+                return
+
+    def is_collide(self, x, y, orientation):
+        """Check if the Tetromino at the given pivot position and orientation collides with walls or existing blocks."""
+        cells, row_masks, min_x, max_x, bottoms = ROTATIONS[self.shape][orientation]
+        return self.tetris.field.is_collide_masks(row_masks, min_x, max_x, x, y)
+
+    def drop_distance(self):
+        """Number of rows the Tetromino can fall before it lands, read from the field's column index."""
+        return self.tetris.field.drop_distance(ROTATIONS[self.shape][self.orientation][4], self.x, self.y)
+
+    def hard_drop(self):
+        """Move the Tetromino straight down to where it lands and mark it as landed."""
+        self.y += self.drop_distance()
+        self.landing = True
+        self.tetris.speed_up = False  # Reset fast falling mode
 
     def move(self, direction):
         """Move the Tetromino in the specified direction (left, right, or down)."""
-        move_direction = MOVE_DIRECTIONS[direction]  # Get movement vector
-        new_block_positions = [block.pos + move_direction for block in self.blocks]
+        dx, dy = MOVE_DIRECTIONS[direction]  # Get movement offset
 
-        if not self.is_collide(new_block_positions):
-            for block in self.blocks:
-                block.pos += move_direction  # Move all blocks
+        if not self.is_collide(self.x + dx, self.y + dy, self.orientation):
+            self.x += dx  # Move all blocks
+            self.y += dy
             self.landing = False
         elif direction == 'down':
             self.landing = True  # If moving down and cannot move further, mark as landed
-            print("Tetromino landed!")
             self.tetris.speed_up = False  # Reset fast falling mode
 
     def update(self):
-        """Update the Tetromino by moving it down automatically each frame."""
+        """Update the Tetromino by moving it down one row."""
         self.move(direction='down')
@@ -0,0 +1,183 @@
+from settings import *  # Import all configuration settings
+from tetris import Tetris  # Import headless Tetris game logic
+from search import PlacementSearch, Heuristic, path_to_actions  # Import the placement search bot
+from multiprocessing import Pool  # Process pool spreading games over the cores
+import argparse  # For command-line options
+import itertools  # For the grid of weight vectors
+import json  # Checkpoint file format
+import os  # For writing checkpoints atomically
+import random  # For the evolutionary search
+
+WEIGHT_NAMES = ('height', 'holes', 'bumpiness', 'lines')  # Heuristic weights, in Heuristic argument order
+
+
+def play_game(task):
+    """Play one seeded game with the placement search bot; only plain numbers go in and out of the worker."""
+    seed, weights, max_pieces, piece_source, lookahead = task
+    tetris = Tetris(seed, piece_source)
+    search = PlacementSearch(Heuristic(*weights), lookahead)
+    pieces = 0  # Tetrominoes locked so far
+    while not tetris.game_over and pieces < max_pieces:
+        placement = search.best(tetris)
+        if placement is None:
+            break  # The Tetromino has no legal move left
+        for actions in path_to_actions(placement.path):
+            tetris.step(actions)
+        pieces += 1
+    return seed, tetris.score, tetris.lines, pieces, tetris.ticks
+
+
+class Tournament:
+    """Evaluates heuristic weight vectors over the same seeded games on a process pool."""
+    def __init__(self, pool, seeds, max_pieces, piece_source, lookahead):
+        self.pool = pool  # Worker processes
+        self.seeds = seeds  # Every candidate plays the same games
+        self.max_pieces = max_pieces  # Games are cut off after this many Tetrominoes
+        self.piece_source = piece_source  # Piece source of every game
+        self.lookahead = lookahead  # Whether the bot also places the next Tetromino
+
+    def evaluate(self, weights):
+        """Play all seeds with the weights and return the aggregated result."""
+        tasks = [(seed, tuple(weights), self.max_pieces, self.piece_source, self.lookahead) for seed in self.seeds]
+        games = list(self.pool.imap_unordered(play_game, tasks, chunksize=max(1, len(tasks) // 64)))
+        count = len(games)
+        return {
+            'weights': list(weights),
+            'games': count,
+            'score': sum(game[1] for game in games) / count,  # Mean score
+            'lines': sum(game[2] for game in games) / count,  # Mean lines cleared
+            'pieces': sum(game[3] for game in games) / count,  # Mean game length in Tetrominoes
+            'ticks': sum(game[4] for game in games) / count,  # Mean game length in ticks
+            'min_score': min(game[1] for game in games),
+            'max_score': max(game[1] for game in games)
+        }
+
+
+def load_checkpoint(path):
+    """Read a checkpoint, or return None when there is none to resume from."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_checkpoint(path, state):
+    """Write a checkpoint atomically, so an interrupted run never leaves a broken file."""
+    if path:
+        with open(path + '.tmp', 'w') as file:
+            json.dump(state, file, indent=1)
+        os.replace(path + '.tmp', path)
+
+
+def report(result):
+    """Print one evaluated weight vector."""
+    weights = ' '.join(f'{name}={weight:+.3f}' for name, weight in zip(WEIGHT_NAMES, result['weights']))
+    print(f"{weights}  score={result['score']:.0f} lines={result['lines']:.1f} "
+          f"pieces={result['pieces']:.0f} ticks={result['ticks']:.0f}", flush=True)
+
+
+def best_result(results):
+    """Return the result with the highest mean score."""
+    return max(results, key=lambda result: result['score'])
+
+
+def run_config(args):
+    """Everything a run's results depend on; a checkpoint is only resumed with the same settings."""
+    config = {'mode': args.mode, 'games': args.games, 'seed': args.seed, 'max_pieces': args.max_pieces,
+              'piece_source': args.piece_source, 'lookahead': not args.no_lookahead}
+    if args.mode == 'evolve':  # More generations may be added to a resumed run
+        config.update(population=args.population, sigma=args.sigma,
+                      start=[float(getattr(args, name).split(',')[0]) for name in WEIGHT_NAMES])
+    return config
+
+
+def run_grid(tournament, args, state):
+    """Evaluate every combination of the given weight values, skipping those already in the checkpoint."""
+    grid = [[float(value) for value in getattr(args, name).split(',')] for name in WEIGHT_NAMES]
+    state.setdefault('results', [])
+    done = {tuple(result['weights']) for result in state['results']}
+    for weights in itertools.product(*grid):
+        if weights in done:
+            continue
+        result = tournament.evaluate(weights)
+        report(result)
+        state['results'].append(result)
+        save_checkpoint(args.checkpoint, state)
+    return state['results']
+
+
+def run_evolve(tournament, args, state):
+    """Evolve the weights: keep the best quarter of each generation and mutate it into the next one."""
+    if 'population' not in state:
+        start = [float(getattr(args, name).split(',')[0]) for name in WEIGHT_NAMES]
+        rng = random.Random(args.seed)
+        state['population'] = [start] + [[weight + rng.gauss(0, args.sigma) for weight in start]
+                                         for _ in range(args.population - 1)]
+        state['generation'] = 0
+        state['results'] = []
+
+    while state['generation'] < args.generations:
+        generation = state['generation']
+        evaluated = state.setdefault('current', [])  # Results of this generation so far
+        for weights in state['population'][len(evaluated):]:
+            result = tournament.evaluate(weights)
+            report(result)
+            evaluated.append(result)
+            save_checkpoint(args.checkpoint, state)
+
+        ranked = sorted(evaluated, key=lambda result: result['score'], reverse=True)
+        state['results'].append(ranked[0])
+        print(f"generation {generation}: best score={ranked[0]['score']:.0f}", flush=True)
+
+        rng = random.Random(args.seed + generation + 1)  # Seeded per generation, so a resumed run matches
+        parents = [result['weights'] for result in ranked[:max(1, len(ranked) // 4)]]
+        state['population'] = parents + [[weight + rng.gauss(0, args.sigma) for weight in rng.choice(parents)]
+                                         for _ in range(args.population - len(parents))]
+        state['generation'] = generation + 1
+        state['current'] = []
+        save_checkpoint(args.checkpoint, state)
+    return state['results']
+
+
+# Run a tournament or tune the heuristic weights from the command line
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate and tune placement search weights over seeded games.')
+    parser.add_argument('mode', choices=('run', 'grid', 'evolve'),
+                        help='run: evaluate one weight vector; grid: every combination; evolve: evolutionary tuning')
+    defaults = Heuristic().weights
+    for name, default in zip(WEIGHT_NAMES, defaults):
+        parser.add_argument(f'--{name}', default=str(default),
+                            help=f'comma-separated values of the {name} weight (default {default})')
+    parser.add_argument('--games', type=int, default=50, help='games per weight vector')
+    parser.add_argument('--seed', type=int, default=0, help='first game seed, also seeds the evolution')
+    parser.add_argument('--max-pieces', type=int, default=500, help='stop a game after this many pieces')
+    parser.add_argument('--piece-source', default=PIECE_SOURCE, help="'random' or 'bag'")
+    parser.add_argument('--no-lookahead', action='store_true', help='do not place the next piece when ranking')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--population', type=int, default=12, help='evolve: weight vectors per generation')
+    parser.add_argument('--generations', type=int, default=10, help='evolve: number of generations')
+    parser.add_argument('--sigma', type=float, default=0.1, help='evolve: mutation standard deviation')
+    parser.add_argument('--checkpoint', help='JSON file saved after every evaluation; an existing one is resumed')
+    args = parser.parse_args()
+
+    config = run_config(args)
+    state = load_checkpoint(args.checkpoint) or {'config': config}
+    if state.get('config') != config:
+        saved = state.get('config', {})
+        changed = [f'{name}={saved.get(name)!r}' for name in config if saved.get(name) != config[name]]
+        parser.error(f"checkpoint {args.checkpoint} belongs to a run with {', '.join(changed)}")
+
+    seeds = range(args.seed, args.seed + args.games)
+    with Pool(args.workers) as pool:
+        tournament = Tournament(pool, seeds, args.max_pieces, args.piece_source, not args.no_lookahead)
+        if args.mode == 'run':
+            results = [tournament.evaluate([float(getattr(args, name)) for name in WEIGHT_NAMES])]
+            report(results[0])
+        elif args.mode == 'grid':
+            results = run_grid(tournament, args, state)
+        else:
+            results = run_evolve(tournament, args, state)
+
+    if results:
+        print('best:', end=' ')
+        report(best_result(results))